@@ -1,23 +1,75 @@
-from typing import Annotated
-from uuid import UUID, uuid4
+from functools import partial
+from typing import Annotated, Any, AsyncIterator
+from urllib.parse import urlencode
+from uuid import UUID
 
+import anyio
 import fastapi
+import orjson
+from httpx import HTTPError, Response
+from starlette.background import BackgroundTask
 
+from db.database import get_unit_of_work, on_commit
 from db.repositories.meme import get_meme_rep, MemeRepository
-from schemas.meme import CRUDMeme, PaginationMeme
+from db.repositories.image_deletion import get_image_deletion_rep, ImageDeletionRepository
+from schemas.meme import (
+    CRUDMeme,
+    PaginationMeme,
+    CursorPaginationMeme,
+    BatchGetMemeRequest,
+    BatchGetMemeResponse,
+    BatchCreateMemeResult,
+    BatchCreateMemeResponse,
+    ExportMeme
+)
 from services.storage import get_storage_service, StorageService
+from services.cache import get_image_cache, is_not_modified, CachedImage, ImageCache
+from services.singleflight import get_image_flight, SingleFlight
+from services.jobs import get_job_queue, JobQueue
+from services.response_cache import get_response_cache, ResponseCache
+from services.variants import VARIANTS_JOB
+from schemas.cache import ImageCacheStats
 from core.settings import settings
+from core.cursor import encode_cursor, decode_datetime_cursor, decode_rank_cursor
 
 
-router = fastapi.APIRouter(tags=['memes'])
+router = fastapi.APIRouter(tags=['memes'], dependencies=[fastapi.Depends(get_unit_of_work)])
+
+MEME_COLUMNS = tuple(CRUDMeme.model_fields)
+
+IMAGE_HEADERS = ('accept-ranges', 'content-length', 'content-range', 'etag', 'last-modified')
 
 
 @router.get('/memes')
 async def get_memes(
     page: Annotated[int, fastapi.Query(ge=1)]=1,
     size: Annotated[int, fastapi.Query(ge=1)]=50,
-    repository: MemeRepository=fastapi.Depends(get_meme_rep)
-) -> PaginationMeme:
+    cursor: Annotated[str | None, fastapi.Query(description='Курсор страницы, пустое значение - первая страница')]=None,
+    with_total: Annotated[bool, fastapi.Query(description='Подсчитывать количество страниц при курсорной пагинации')]=True,
+    if_none_match: Annotated[str | None, fastapi.Header()]=None,
+    repository: MemeRepository=fastapi.Depends(get_meme_rep),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)) -> PaginationMeme | CursorPaginationMeme:
+    version = await repository.get_version()
+    etag = f'W/"{version}"'
+    if is_not_modified({'etag': etag}, if_none_match, None):
+        return fastapi.Response(status_code=304, headers={'ETag': etag})
+
+    params = {'page': page, 'size': size, 'cursor': cursor, 'with_total': with_total, 'version': version}
+    cache_key = await response_cache.make_key('memes', params)
+    content = await response_cache.get(cache_key)
+    if content is None:
+        if cursor is not None:
+            response = await get_memes_by_cursor(cursor, size, with_total, repository)
+            content = response.model_dump_json().encode()
+        else:
+            content = orjson.dumps(await get_memes_by_page(page, size, repository))
+        await response_cache.set(cache_key, content)
+    return raw_json_response(content, etag)
+
+def raw_json_response(content: bytes, etag: str) -> fastapi.Response:
+    return fastapi.Response(content=content, media_type='application/json', headers={'ETag': etag})
+
+async def get_memes_by_page(page: int, size: int, repository: MemeRepository) -> dict[str, Any]:
     count = await repository.count()
 
     if count == 0:
@@ -28,86 +80,357 @@ async def get_memes(
 
     if page > total_pages:
         raise fastapi.HTTPException(status_code=400, detail='Номер страницы превышает доступное количество')
-    list_meme = await repository.get_multi(offset=skip_items, limit=size)
-    response = PaginationMeme(
+    list_meme = await repository.get_multi(offset=skip_items, limit=size, columns=MEME_COLUMNS)
+    return {
+        'list_meme': list_meme,
+        'total_pages': total_pages,
+        'page': page,
+        'size': size
+    }
+
+async def get_memes_by_cursor(cursor: str, size: int, with_total: bool, repository: MemeRepository) -> CursorPaginationMeme:
+    after = None
+    if cursor:
+        try:
+            after = decode_datetime_cursor(cursor)
+        except ValueError as exc:
+            raise fastapi.HTTPException(status_code=400, detail=str(exc))
+
+    list_meme = await repository.get_multi_after(cursor=after, limit=size + 1)
+    if not list_meme and after is None:
+        raise fastapi.HTTPException(status_code=404, detail='Мемов нет')
+
+    next_cursor = None
+    if len(list_meme) > size:
+        list_meme = list_meme[:size]
+        last = list_meme[-1]
+        next_cursor = encode_cursor(last.created_datetime, last.id)
+
+    total_pages = None
+    if with_total:
+        count = await repository.count()
+        total_pages = (count // size) + (count % size > 0)
+    return CursorPaginationMeme(
         list_meme=list_meme,
+        next_cursor=next_cursor,
         total_pages=total_pages,
-        page=page,
         size=size
     )
-    return response
+
+@router.post('/memes:batchGet')
+async def batch_get_memes(
+    request: BatchGetMemeRequest,
+    repository: MemeRepository=fastapi.Depends(get_meme_rep)
+) -> BatchGetMemeResponse:
+    ids = list(dict.fromkeys(request.ids))
+    memes = {meme.id: meme for meme in await repository.get_many(ids)}
+    return BatchGetMemeResponse(
+        list_meme=[memes[id] for id in ids if id in memes],
+        missing=[id for id in ids if id not in memes]
+    )
+
+@router.get('/memes:search')
+async def search_memes(
+    q: Annotated[str, fastapi.Query(min_length=1, max_length=255, description='Поисковый запрос')],
+    size: Annotated[int, fastapi.Query(ge=1)]=50,
+    cursor: Annotated[str | None, fastapi.Query(description='Курсор страницы, пустое значение - первая страница')]=None,
+    repository: MemeRepository=fastapi.Depends(get_meme_rep)
+) -> CursorPaginationMeme:
+    after = None
+    if cursor:
+        try:
+            after = decode_rank_cursor(cursor)
+        except ValueError as exc:
+            raise fastapi.HTTPException(status_code=400, detail=str(exc))
+
+    results = await repository.search(q, cursor=after, limit=size + 1, trigram=settings.MEME_SEARCH_TRIGRAM)
+    next_cursor = None
+    if len(results) > size:
+        results = results[:size]
+        last, rank = results[-1]
+        next_cursor = encode_cursor(rank, last.id)
+    return CursorPaginationMeme(
+        list_meme=[meme for meme, _ in results],
+        next_cursor=next_cursor,
+        size=size
+    )
+
+@router.get('/memes:export')
+async def export_memes(
+    cursor: Annotated[str | None, fastapi.Query(description='Курсор последней выгруженной записи')]=None,
+    repository: MemeRepository=fastapi.Depends(get_meme_rep)
+) -> fastapi.responses.StreamingResponse:
+    after = None
+    if cursor:
+        try:
+            after = decode_datetime_cursor(cursor)
+        except ValueError as exc:
+            raise fastapi.HTTPException(status_code=400, detail=str(exc))
+    return fastapi.responses.StreamingResponse(
+        iter_export_lines(repository, after),
+        media_type='application/x-ndjson'
+    )
+
+async def iter_export_lines(repository: MemeRepository, after: tuple | None) -> AsyncIterator[str]:
+    async for meme in repository.stream_after(cursor=after, batch_size=settings.MEME_EXPORT_BATCH_SIZE):
+        line = ExportMeme(
+            id=meme.id,
+            description=meme.description,
+            image_url=meme.image_url,
+            image_name=meme.image_name,
+            variants=meme.variants,
+            created_datetime=meme.created_datetime,
+            cursor=encode_cursor(meme.created_datetime, meme.id)
+        )
+        yield line.model_dump_json() + '\n'
 
 @router.get('/memes/{id}')
 async def get_meme(
+    http_response: fastapi.Response,
     id: Annotated[UUID, fastapi.Path(title='Идентификатор мема')],
-    repository: MemeRepository=fastapi.Depends(get_meme_rep)
-) -> CRUDMeme:
+    if_none_match: Annotated[str | None, fastapi.Header()]=None,
+    repository: MemeRepository=fastapi.Depends(get_meme_rep),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)) -> CRUDMeme:
+    version = await repository.get_version()
+    etag = f'W/"{version}"'
+    if is_not_modified({'etag': etag}, if_none_match, None):
+        return fastapi.Response(status_code=304, headers={'ETag': etag})
+
+    cache_key = await response_cache.make_key('meme', {'id': id, 'version': version})
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return raw_json_response(cached, etag)
+
     meme = await repository.get(id)
     if not meme:
         raise fastapi.HTTPException(status_code=404, detail='Мем не найден')
-    return meme
+    response = CRUDMeme.model_validate(meme)
+    await response_cache.set(cache_key, response.model_dump_json().encode())
+    http_response.headers['ETag'] = etag
+    return response
 
 @router.post('/memes')
 async def create_meme(
     description: Annotated[str, fastapi.Form(description='Описание мема')],
     image: Annotated[fastapi.UploadFile, fastapi.File(description='Файл изображения мема')],
     repository: MemeRepository=fastapi.Depends(get_meme_rep),
-    storage: StorageService=fastapi.Depends(get_storage_service)
+    storage: StorageService=fastapi.Depends(get_storage_service),
+    jobs: JobQueue=fastapi.Depends(get_job_queue),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)
 ) -> CRUDMeme:
     try:
-        file = await image.read()
-        filename = f'{uuid4().hex}:{image.filename}'
-        image_name = await storage.put_image(filename, file)
+        image_name = await store_image(image, repository, storage)
         image_url = f'{settings.SERVICE_IMAGE_ROUTE}{image_name}'
     finally:
         await image.close()
     meme = CRUDMeme(description=description, image_url=image_url, image_name=image_name)
     meme = await repository.create(meme)
+    await on_commit(response_cache.bump)
+    await on_commit(partial(jobs.submit, VARIANTS_JOB, meme_id=str(meme.id), image_name=meme.image_name))
     return meme
 
+@router.post('/memes:batchCreate')
+async def batch_create_memes(
+    descriptions: Annotated[list[str], fastapi.Form(description='Описания мемов')],
+    images: Annotated[list[fastapi.UploadFile], fastapi.File(description='Файлы изображений мемов')],
+    repository: MemeRepository=fastapi.Depends(get_meme_rep),
+    storage: StorageService=fastapi.Depends(get_storage_service),
+    jobs: JobQueue=fastapi.Depends(get_job_queue),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)
+) -> BatchCreateMemeResponse:
+    if len(descriptions) != len(images):
+        raise fastapi.HTTPException(status_code=400, detail='Количество описаний не совпадает с количеством изображений')
+    if len(images) > settings.MEME_IMPORT_MAX_ITEMS:
+        raise fastapi.HTTPException(status_code=400, detail='Превышено количество мемов в запросе')
+
+    image_names: dict[int, str] = {}
+    errors: dict[int, str] = {}
+    semaphore = anyio.Semaphore(settings.MEME_IMPORT_CONCURRENCY)
+
+    async def upload(index: int, image: fastapi.UploadFile, image_name: str | None=None) -> None:
+        try:
+            async with semaphore:
+                if image_name is None or not await storage.image_exists(image_name):
+                    await image.seek(0)
+                    image_names[index] = await storage.put_image(image.filename, image.file, content_addressed=True)
+        except fastapi.HTTPException as exc:
+            image_names.pop(index, None)
+            errors[index] = exc.detail
+        except HTTPError:
+            image_names.pop(index, None)
+            errors[index] = 'Неполадки в работе'
+
+    try:
+        async with anyio.create_task_group() as task_group:
+            for index, image in enumerate(images):
+                task_group.start_soon(upload, index, image)
+        await repository.lock_images(list(image_names.values()))
+        async with anyio.create_task_group() as task_group:
+            for index, image_name in list(image_names.items()):
+                task_group.start_soon(upload, index, images[index], image_name)
+    finally:
+        for image in images:
+            await image.close()
+
+    indexes = sorted(image_names)
+    memes_in = [
+        CRUDMeme(
+            description=descriptions[index],
+            image_url=f'{settings.SERVICE_IMAGE_ROUTE}{image_names[index]}',
+            image_name=image_names[index]
+        )
+        for index in indexes
+    ]
+    memes = dict(zip(indexes, await repository.create_many(memes_in, chunk_size=settings.MEME_IMPORT_CHUNK_SIZE)))
+    if memes:
+        await on_commit(response_cache.bump)
+    for meme in memes.values():
+        await on_commit(partial(jobs.submit, VARIANTS_JOB, meme_id=str(meme.id), image_name=meme.image_name))
+
+    return BatchCreateMemeResponse(results=[
+        BatchCreateMemeResult(index=index, meme=memes.get(index), error=errors.get(index))
+        for index in range(len(images))
+    ])
+
 @router.put('/memes/{id}')
 async def update_meme(
     id: Annotated[UUID, fastapi.Path(title='Идентификатор мема')],
     description: Annotated[str | None, fastapi.Form(description='Описание мема')]=None,
     image: Annotated[fastapi.UploadFile | None, fastapi.File(description='Файл изображения мема')]=None,
     repository: MemeRepository=fastapi.Depends(get_meme_rep),
-    storage: StorageService=fastapi.Depends(get_storage_service)
+    storage: StorageService=fastapi.Depends(get_storage_service),
+    deletions: ImageDeletionRepository=fastapi.Depends(get_image_deletion_rep),
+    image_cache: ImageCache=fastapi.Depends(get_image_cache),
+    jobs: JobQueue=fastapi.Depends(get_job_queue),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)
 ) -> CRUDMeme:
-    meme = await repository.get(id)
-    if not meme:
-        raise fastapi.HTTPException(status_code=404, detail='Мем не найден')
+    image_name = image_url = None
     if image:
         try:
-            file = await image.read()
-            image_name = await storage.put_image(meme.image_name, file)
+            image_name = await store_image(image, repository, storage)
             image_url = f'{settings.SERVICE_IMAGE_ROUTE}{image_name}'
         finally:
             await image.close()
-    else:
-        image_url, image_name = meme.image_url, meme.image_name
-    if not description:
-        description = meme.description
-    meme_in = CRUDMeme(description=description, image_url=image_url, image_name=image_name)
-    meme = await repository.update(db_obj=meme, obj_in=meme_in)
+    result = await repository.update_meme(id, description=description, image_name=image_name, image_url=image_url)
+    if result is None:
+        if image_name is not None:
+            await release_image(image_name, deletions, image_cache)
+        return fastapi.responses.JSONResponse(status_code=404, content={'detail': 'Мем не найден'})
+    meme, old_image_name = result
+    await on_commit(response_cache.bump)
+    if image_name is not None and image_name != old_image_name:
+        await release_image(old_image_name, deletions, image_cache)
+        await on_commit(partial(jobs.submit, VARIANTS_JOB, meme_id=str(meme.id), image_name=meme.image_name))
     return meme
 
 @router.delete('/memes/{id}')
 async def delete_meme(
     id: Annotated[UUID, fastapi.Path(title='Идентификатор мема')],
     repository: MemeRepository=fastapi.Depends(get_meme_rep),
-    storage: StorageService=fastapi.Depends(get_storage_service)
+    deletions: ImageDeletionRepository=fastapi.Depends(get_image_deletion_rep),
+    image_cache: ImageCache=fastapi.Depends(get_image_cache),
+    response_cache: ResponseCache=fastapi.Depends(get_response_cache)
 )->fastapi.Response:
-    meme = await repository.get(id)
+    meme = await repository.remove_returning(id)
     if not meme:
         raise fastapi.HTTPException(status_code=404, detail='Мем не найден')
-    await storage.remove_file(meme.image_name)
-    await repository.remove(id)
+    await on_commit(response_cache.bump)
+    await release_image(meme.image_name, deletions, image_cache)
     return fastapi.Response(status_code=200)
 
+async def store_image(image: fastapi.UploadFile, repository: MemeRepository, storage: StorageService) -> str:
+    image_name = await storage.put_image(image.filename, image.file, content_addressed=True)
+    await repository.lock_images([image_name])
+    if not await storage.image_exists(image_name):
+        await image.seek(0)
+        image_name = await storage.put_image(image.filename, image.file, content_addressed=True)
+    return image_name
+
+async def release_image(image_name: str, deletions: ImageDeletionRepository, image_cache: ImageCache) -> None:
+    await deletions.enqueue(image_name)
+    image_cache.invalidate_image(image_name)
+
+def get_cache_key(image_name: str, params: dict[str, str | int]) -> str:
+    return f'{image_name}?{urlencode(params)}' if params else image_name
+
+def get_image_headers(response: Response) -> dict[str, str]:
+    return {name: response.headers[name] for name in IMAGE_HEADERS if name in response.headers}
+
+def stream_image_response(response: Response, chunk_size: int) -> fastapi.Response:
+    return fastapi.responses.StreamingResponse(
+        response.aiter_bytes(chunk_size),
+        status_code=response.status_code,
+        media_type='image/*',
+        headers=get_image_headers(response),
+        background=BackgroundTask(response.aclose)
+    )
+
+async def load_image(
+    image_name: str,
+    params: dict[str, str | int],
+    storage: StorageService,
+    image_cache: ImageCache
+) -> CachedImage | Response:
+    response = await storage.stream_image(image_name, params=params)
+    headers = get_image_headers(response)
+    content_length = int(headers['content-length']) if 'content-length' in headers else None
+    if not image_cache.accepts(content_length):
+        return response
+    try:
+        content = await response.aread()
+    finally:
+        await response.aclose()
+    return image_cache.set(get_cache_key(image_name, params), content, headers)
+
 @router.get('/images/{image_name}')
 async def get_image(
     image_name: Annotated[str, fastapi.Path(description='Название изображения')],
-    storage: StorageService=fastapi.Depends(get_storage_service)
+    w: Annotated[int | None, fastapi.Query(description='Ширина миниатюры')]=None,
+    fmt: Annotated[str | None, fastapi.Query(description='Формат миниатюры')]=None,
+    byte_range: Annotated[str | None, fastapi.Header(alias='Range')]=None,
+    if_none_match: Annotated[str | None, fastapi.Header()]=None,
+    if_modified_since: Annotated[str | None, fastapi.Header()]=None,
+    storage: StorageService=fastapi.Depends(get_storage_service),
+    image_cache: ImageCache=fastapi.Depends(get_image_cache),
+    image_flight: SingleFlight=fastapi.Depends(get_image_flight)
 ) -> fastapi.Response:
-    image = await storage.get_image(image_name)
-    return fastapi.Response(content=image, media_type='image/*')
+    params = {name: value for name, value in (('w', w), ('fmt', fmt)) if value is not None}
+    if settings.IMAGE_DELIVERY == 'redirect':
+        url = await storage.get_image_url(image_name, params)
+        return fastapi.responses.RedirectResponse(url, status_code=302)
+
+    if not byte_range or params:
+        key = get_cache_key(image_name, params)
+        cached = image_cache.get(key)
+        if cached is None:
+            result, shared = await image_flight.do(key, partial(load_image, image_name, params, storage, image_cache))
+            if isinstance(result, CachedImage):
+                cached = result
+            elif not shared:
+                if is_not_modified(get_image_headers(result), if_none_match, if_modified_since):
+                    await result.aclose()
+                    return fastapi.Response(status_code=304, headers=get_image_headers(result))
+                return stream_image_response(result, storage.chunk_size)
+        if cached:
+            if cached.is_not_modified(if_none_match, if_modified_since):
+                return fastapi.Response(status_code=304, headers=cached.headers)
+            return fastapi.Response(content=cached.content, media_type='image/*', headers=cached.headers)
+
+    request_headers = {
+        'Range': byte_range,
+        'If-None-Match': if_none_match,
+        'If-Modified-Since': if_modified_since
+    }
+    response = await storage.stream_image(
+        image_name,
+        headers={name: value for name, value in request_headers.items() if value}
+    )
+    if response.status_code == 304:
+        return fastapi.Response(status_code=304, headers=get_image_headers(response))
+    return stream_image_response(response, storage.chunk_size)
+
+@router.get('/cache/images')
+async def get_image_cache_stats(
+    image_cache: ImageCache=fastapi.Depends(get_image_cache)
+) -> ImageCacheStats:
+    return ImageCacheStats(**image_cache.stats())
@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Некорректный курсор') from exc
+    if not isinstance(values, list):
+        raise ValueError('Некорректный курсор')
+    return values
+
+
+def decode_datetime_cursor(cursor: str) -> tuple[datetime, UUID]:
+    values = decode_cursor(cursor)
+    try:
+        created_datetime, id = values
+        return datetime.fromisoformat(created_datetime), UUID(id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Некорректный курсор') from exc
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, UUID]:
+    values = decode_cursor(cursor)
+    try:
+        rank, id = values
+        return float(rank), UUID(id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Некорректный курсор') from exc
@@ -0,0 +1,23 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson')
+
+
+class JSONGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message['type'] == 'http.response.start':
+            content_type = Headers(raw=message['headers']).get('content-type', '')
+            if not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.content_encoding_set = True
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http' and 'gzip' in Headers(scope=scope).get('Accept-Encoding', ''):
+            responder = JSONGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
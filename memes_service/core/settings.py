@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional, Any
+from typing import Optional, Any, Literal
 import os
 
 from pydantic import PostgresDsn, validator
@@ -14,11 +14,64 @@ class Settings(BaseSettings):
     STORAGE_GET_ROUTE: str
     STORAGE_PUT_ROUTE: str
     STORAGE_DELETE_ROUTE: str
+    STORAGE_BATCH_DELETE_ROUTE: str = '/images:batchDelete'
+    STORAGE_TIMEOUT: float = 10
+    STORAGE_CONNECT_TIMEOUT: float = 3
+    STORAGE_MAX_CONNECTIONS: int = 100
+    STORAGE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    STORAGE_KEEPALIVE_EXPIRY: float = 30
+    STORAGE_HTTP2: bool = False
+    STORAGE_CHUNK_SIZE: int = 64 * 1024
+    STORAGE_URL_REFRESH_MARGIN: float = 30
+    STORAGE_URL_CACHE_SIZE: int = 10000
+    IMAGE_DELIVERY: Literal['proxy', 'redirect'] = 'proxy'
+    IMAGE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    IMAGE_CACHE_MAX_ITEM_BYTES: int = 2 * 1024 * 1024
+    IMAGE_CACHE_TTL: float = 300
+    MEME_VARIANT_WIDTHS: list[int] = [320, 640]
+    MEME_VARIANT_FORMATS: list[str] = ['webp']
+    MEME_VARIANT_CONCURRENCY: int = 4
+    MEME_IMPORT_MAX_ITEMS: int = 1000
+    MEME_IMPORT_CONCURRENCY: int = 8
+    MEME_IMPORT_CHUNK_SIZE: int = 500
+    MEME_EXPORT_BATCH_SIZE: int = 1000
+    MEME_SEARCH_TRIGRAM: bool = False
+    RESPONSE_CACHE_BACKEND: Literal['none', 'memory', 'redis'] = 'memory'
+    RESPONSE_CACHE_TTL: float = 10
+    RESPONSE_CACHE_MAX_ITEMS: int = 1000
+    RESPONSE_CACHE_REDIS_URL: str = 'redis://localhost:6379/0'
+    RESPONSE_GZIP: bool = True
+    RESPONSE_GZIP_MIN_SIZE: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    JOB_BACKEND: Literal['memory', 'redis'] = 'memory'
+    JOB_REDIS_URL: str = 'redis://localhost:6379/0'
+    JOB_QUEUE_NAME: str = 'memes:jobs'
+    JOB_QUEUE_SIZE: int = 1000
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 1
+    IMAGE_DELETION_BATCH_SIZE: int = 500
+    IMAGE_DELETION_INTERVAL: float = 5
+    IMAGE_DELETION_RETRY_DELAY: float = 30
+    IMAGE_DELETION_MAX_RETRY_DELAY: float = 3600
     POSTGRES_SERVER: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     SQLALCHEMY_DATABASE_URI: PostgresDsn | str = None
+    SQLALCHEMY_REPLICA_URI: str | None = None
+    DB_READ_YOUR_WRITES: bool = True
+    DB_REPLICA_HEALTH_INTERVAL: float = 5
+    DB_REPLICA_HEALTH_TIMEOUT: float = 1
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    MEME_COUNT_STRATEGY: Literal['exact', 'cached', 'counter', 'estimate'] = 'exact'
+    MEME_COUNT_TTL: float = 30
+    MEME_COUNT_RESYNC_INTERVAL: float = 300
+    MEME_COUNT_ESTIMATE_THRESHOLD: int = 10000
 
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: dict[str, Any]) -> Any:
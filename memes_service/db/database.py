@@ -1,19 +1,146 @@
+import logging
+import time
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+import anyio
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncEngine, AsyncSession
 
 from core.settings import settings
 
-session_factory: AsyncSession = async_sessionmaker(
-            create_async_engine(
-                settings.SQLALCHEMY_DATABASE_URI
-            )
-        )
+
+logger = logging.getLogger(__name__)
+
+
+def create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+
+
+class ReplicaHealth:
+    def __init__(self, engine: AsyncEngine, interval: float, timeout: float):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.healthy = True
+        self._next_check = 0.0
+
+    async def is_healthy(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_check:
+            return self.healthy
+        self._next_check = now + self.interval
+        try:
+            with anyio.fail_after(self.timeout):
+                async with self.engine.connect() as connection:
+                    await connection.execute(text('SELECT 1'))
+            self.healthy = True
+        except (TimeoutError, DBAPIError, OSError):
+            self.healthy = False
+        return self.healthy
+
+    def mark_unhealthy(self) -> None:
+        self.healthy = False
+        self._next_check = time.monotonic() + self.interval
+
+
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+
+session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(engine, expire_on_commit=False)
+
+replica_session_factory: async_sessionmaker[AsyncSession] | None = None
+replica_health: ReplicaHealth | None = None
+if settings.SQLALCHEMY_REPLICA_URI:
+    replica_engine = create_engine(settings.SQLALCHEMY_REPLICA_URI)
+    replica_session_factory = async_sessionmaker(replica_engine, expire_on_commit=False)
+    replica_health = ReplicaHealth(
+        replica_engine,
+        interval=settings.DB_REPLICA_HEALTH_INTERVAL,
+        timeout=settings.DB_REPLICA_HEALTH_TIMEOUT
+    )
+
+_current_session: ContextVar[AsyncSession | None] = ContextVar('current_session', default=None)
 
 @asynccontextmanager
-async def get_session() -> AsyncSession:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
     try:
         session = session_factory()
         yield session
     finally:
-        await session.close()
\ No newline at end of file
+        await session.close()
+
+@asynccontextmanager
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    current = _current_session.get()
+    if current is not None and settings.DB_READ_YOUR_WRITES and current.info.get('has_writes'):
+        yield current
+        return
+    if replica_session_factory is None or not await replica_health.is_healthy():
+        async with get_session() as session:
+            yield session
+        return
+    session = replica_session_factory()
+    try:
+        yield session
+    except (DBAPIError, OSError):
+        replica_health.mark_unhealthy()
+        raise
+    finally:
+        await session.close()
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
+    session = session_factory()
+    token = _current_session.set(session)
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        _current_session.reset(token)
+        await session.close()
+    for callback in session.info.get('on_commit', []):
+        await run_callback(callback)
+
+async def get_unit_of_work() -> AsyncIterator[AsyncSession]:
+    async with unit_of_work() as session:
+        yield session
+
+async def commit(session: AsyncSession) -> None:
+    session.info['has_writes'] = True
+    if session is _current_session.get():
+        await session.flush()
+    else:
+        await session.commit()
+
+async def run_callback(callback: Callable[[], Awaitable[Any]]) -> None:
+    try:
+        await callback()
+    except Exception:
+        logger.exception('Ошибка обработчика после фиксации транзакции')
+
+async def on_commit(callback: Callable[[], Awaitable[Any]]) -> None:
+    session = _current_session.get()
+    if session is None:
+        await run_callback(callback)
+    else:
+        session.info.setdefault('on_commit', []).append(callback)
@@ -0,0 +1,20 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, UUID, DateTime, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+
+
+class ImageDeletion(Base):
+    __tablename__ = 'image_deletion'
+    __table_args__ = (
+        Index('ix_image_deletion_next_attempt_datetime', 'next_attempt_datetime'),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    image_name: Mapped[str] = mapped_column(String(255))
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_datetime: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_datetime: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,16 +1,30 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, UUID, DateTime
+from sqlalchemy import String, UUID, DateTime, Index, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db.models.base import Base
 
+SEARCH_CONFIG = 'russian'
+
 class Meme(Base):
     __tablename__ = 'meme'
+    __table_args__ = (
+        Index('ix_meme_created_datetime_id', 'created_datetime', 'id'),
+        Index('ix_meme_image_name', 'image_name'),
+        Index('ix_meme_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
     description: Mapped[str | None] = mapped_column(String(255))
     image_url: Mapped[str] = mapped_column(String(255))
     image_name: Mapped[str] = mapped_column(String(255))
+    variants: Mapped[dict[str, str] | None] = mapped_column(JSONB)
     created_datetime: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', coalesce(description, ''))", persisted=True),
+        deferred=True
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+
+
+class MemeVersion(Base):
+    __tablename__ = 'meme_version'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
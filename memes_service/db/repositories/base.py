@@ -1,11 +1,13 @@
-from typing import Generic, TypeVar, Any
+from typing import Generic, TypeVar, Any, AsyncIterator, Callable
 
 from pydantic import BaseModel
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, insert, update, delete, func, tuple_, text, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
 from fastapi.encoders import jsonable_encoder
 
-from db.database import get_session
+from db.database import get_session, get_read_session, commit, on_commit
 from db.models.base import Base
+from db.repositories.count import CountStrategy, ExactCount
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -13,31 +15,75 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: ModelType):
+    def __init__(self, model: ModelType, counter: CountStrategy | None=None):
         self.model = model
+        self.counter = counter or ExactCount()
 
     async def get(self, id: Any) -> ModelType | None:
-        async with get_session() as session:
+        async with get_read_session() as session:
             db_obj = await session.execute(
                 select(self.model).filter(self.model.id == id)
             )
             return db_obj.scalars().first()
 
-    async def get_multi(self, *, offset:int=0,limit:int=100) -> list[ModelType]:
-        async with get_session() as session:
+    async def get_many(self, ids: list[Any]) -> list[ModelType]:
+        if not ids:
+            return []
+        ids_param = bindparam('ids', list(ids), type_=ARRAY(self.model.id.type))
+        async with get_read_session() as session:
             db_obj = await session.execute(
-                select(self.model).order_by(self.model.created_datetime.desc()).offset(offset).limit(limit)
+                select(self.model).filter(self.model.id == any_(ids_param))
             )
             return db_obj.scalars().all()
 
+    async def get_multi(self, *, offset:int=0,limit:int=100, columns: tuple[str, ...] | None=None) -> list[ModelType] | list[dict[str, Any]]:
+        query = select(*(self.model.__table__.c[name] for name in columns)) if columns else select(self.model)
+        async with get_read_session() as session:
+            db_obj = await session.execute(
+                query.order_by(self.model.created_datetime.desc()).offset(offset).limit(limit)
+            )
+            if columns:
+                return [dict(row) for row in db_obj.mappings()]
+            return db_obj.scalars().all()
+
+    async def get_multi_after(self, *, cursor: tuple[Any, Any] | None=None, limit:int=100) -> list[ModelType]:
+        query = select(self.model).order_by(self.model.created_datetime.desc(), self.model.id.desc())
+        if cursor is not None:
+            query = query.filter(tuple_(self.model.created_datetime, self.model.id) < tuple_(*cursor))
+        async with get_read_session() as session:
+            db_obj = await session.execute(query.limit(limit))
+            return db_obj.scalars().all()
+
+    async def stream_after(self, *, cursor: tuple[Any, Any] | None=None, batch_size: int=1000) -> AsyncIterator[ModelType]:
+        query = select(self.model).order_by(self.model.created_datetime, self.model.id)
+        if cursor is not None:
+            query = query.filter(tuple_(self.model.created_datetime, self.model.id) > tuple_(*cursor))
+        async with get_read_session() as session:
+            result = await session.stream_scalars(query.execution_options(yield_per=batch_size))
+            async for db_obj in result:
+                yield db_obj
+
     async def create(self, obj_in: CreateSchemaType) -> ModelType:
         async with get_session() as session:
             db_obj = self.model(**obj_in.dict())
             session.add(db_obj)
-            await session.commit()
+            await commit(session)
             await session.refresh(db_obj)
+            await self.track_count(self.counter.on_create, 1)
             return db_obj
 
+    async def create_many(self, objs_in: list[CreateSchemaType], chunk_size: int=500) -> list[ModelType]:
+        db_objs = []
+        async with get_session() as session:
+            for start in range(0, len(objs_in), chunk_size):
+                rows = [obj_in.model_dump(exclude_none=True) for obj_in in objs_in[start:start + chunk_size]]
+                result = await session.scalars(insert(self.model).returning(self.model, sort_by_parameter_order=True), rows)
+                chunk = result.all()
+                await commit(session)
+                await self.track_count(self.counter.on_create, len(chunk))
+                db_objs.extend(chunk)
+        return db_objs
+
     async def update(self, db_obj: ModelType, obj_in: UpdateSchemaType) -> ModelType:
         async with get_session() as session:
             obj_data = jsonable_encoder(obj_in)
@@ -49,19 +95,69 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 if field in update_data:
                     setattr(db_obj, field, update_data[field])
             session.add(db_obj)
-            await session.commit()
+            await commit(session)
             await session.refresh(db_obj)
             return db_obj
 
+    async def update_returning(self, id: Any, values: dict[str, Any], *old_columns: str) -> tuple[Any, ...] | None:
+        table = self.model.__table__
+        query = update(table).filter(table.c.id == id).values(**values).returning(*table.c)
+        columns = []
+        if old_columns:
+            previous = (
+                select(table.c.id, *(table.c[name] for name in old_columns))
+                .filter(table.c.id == id)
+                .with_for_update()
+                .cte('previous')
+            )
+            columns = [previous.c[name].label(f'old_{name}') for name in old_columns]
+            query = query.filter(previous.c.id == table.c.id).returning(*columns)
+        async with get_session() as session:
+            result = await session.execute(
+                select(self.model, *columns).from_statement(query).execution_options(populate_existing=True)
+            )
+            row = result.first()
+            await commit(session)
+            return tuple(row) if row else None
+
+    async def remove_returning(self, id: Any) -> ModelType | None:
+        async with get_session() as session:
+            result = await session.execute(
+                delete(self.model).filter(self.model.id == id).returning(self.model)
+            )
+            db_obj = result.scalars().first()
+            await commit(session)
+            if db_obj is not None:
+                await self.track_count(self.counter.on_remove, 1)
+            return db_obj
+
     async def remove(self, id: Any) -> Any:
         async with get_session() as session:
-            await session.execute(delete(self.model).filter(self.model.id == id))
-            await session.commit()
+            result = await session.execute(delete(self.model).filter(self.model.id == id))
+            await commit(session)
+            if result.rowcount:
+                await self.track_count(self.counter.on_remove, result.rowcount)
             return id
 
+    async def track_count(self, hook: Callable[[int], None], amount: int) -> None:
+        async def callback() -> None:
+            hook(amount)
+        await on_commit(callback)
+
     async def count(self) -> int:
-        async with get_session() as session:
+        return await self.counter.count(self)
+
+    async def count_exact(self) -> int:
+        async with get_read_session() as session:
             count = await session.execute(
                 select(func.count()).select_from(self.model)
             )
-            return count.scalars().first()
\ No newline at end of file
+            return count.scalars().first()
+
+    async def count_estimate(self) -> int:
+        async with get_read_session() as session:
+            count = await session.execute(
+                text('SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)'),
+                {'table': self.model.__tablename__}
+            )
+            return count.scalars().first()
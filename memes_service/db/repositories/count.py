@@ -0,0 +1,70 @@
+import time
+from typing import Any
+
+from core.settings import Settings
+
+
+class CountStrategy:
+    async def count(self, repository: Any) -> int:
+        return await repository.count_exact()
+
+    def on_create(self, amount: int=1) -> None:
+        pass
+
+    def on_remove(self, amount: int=1) -> None:
+        pass
+
+
+class ExactCount(CountStrategy):
+    pass
+
+
+class CachedCount(CountStrategy):
+    def __init__(self, ttl: float | None):
+        self.ttl = ttl
+        self._value: int | None = None
+        self._expires_at = 0.0
+
+    async def count(self, repository: Any) -> int:
+        now = time.monotonic()
+        if self._value is None or (self.ttl is not None and now >= self._expires_at):
+            self._value = await repository.count_exact()
+            self._expires_at = now + (self.ttl or 0)
+        return self._value
+
+    def on_create(self, amount: int=1) -> None:
+        if self._value is not None:
+            self._value += amount
+
+    def on_remove(self, amount: int=1) -> None:
+        if self._value is not None:
+            self._value = max(self._value - amount, 0)
+
+
+class TrackedCount(CachedCount):
+    def __init__(self, resync_interval: float):
+        super().__init__(ttl=resync_interval)
+
+
+class EstimatedCount(CountStrategy):
+    def __init__(self, exact_below: int):
+        self.exact_below = exact_below
+
+    async def count(self, repository: Any) -> int:
+        estimate = await repository.count_estimate()
+        if estimate < self.exact_below:
+            return await repository.count_exact()
+        return estimate
+
+
+def get_count_strategy(settings: Settings) -> CountStrategy:
+    strategy = settings.MEME_COUNT_STRATEGY
+    if strategy == 'exact':
+        return ExactCount()
+    if strategy == 'cached':
+        return CachedCount(ttl=settings.MEME_COUNT_TTL)
+    if strategy == 'counter':
+        return TrackedCount(resync_interval=settings.MEME_COUNT_RESYNC_INTERVAL)
+    if strategy == 'estimate':
+        return EstimatedCount(exact_below=settings.MEME_COUNT_ESTIMATE_THRESHOLD)
+    raise ValueError(f'Неизвестная стратегия подсчета: {strategy}')
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from uuid import UUID
+
+from sqlalchemy import Interval, delete, func, insert, literal, select, update
+
+from db.database import get_session, commit
+from db.models.image_deletion import ImageDeletion
+
+
+class ImageDeletionRepository:
+    def __init__(self, model: type[ImageDeletion]):
+        self.model = model
+
+    async def enqueue(self, image_name: str) -> None:
+        async with get_session() as session:
+            await session.execute(insert(self.model).values(image_name=image_name))
+            await commit(session)
+
+    async def claim(self, limit: int, retry_delay: float, max_retry_delay: float) -> list[ImageDeletion]:
+        now = datetime.utcnow()
+        pending = (
+            select(self.model.id)
+            .filter(self.model.next_attempt_datetime <= now)
+            .order_by(self.model.next_attempt_datetime)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        delay = func.least(
+            literal(timedelta(seconds=retry_delay), Interval) * func.power(2, self.model.attempts),
+            literal(timedelta(seconds=max_retry_delay), Interval)
+        )
+        async with get_session() as session:
+            result = await session.execute(
+                update(self.model)
+                .filter(self.model.id.in_(pending))
+                .values(attempts=self.model.attempts + 1, next_attempt_datetime=literal(now) + delay)
+                .returning(self.model)
+            )
+            deletions = result.scalars().all()
+            await commit(session)
+            return deletions
+
+    async def complete(self, ids: list[UUID]) -> None:
+        if not ids:
+            return
+        async with get_session() as session:
+            await session.execute(delete(self.model).filter(self.model.id.in_(ids)))
+            await commit(session)
+
+
+@lru_cache
+def get_image_deletion_rep() -> ImageDeletionRepository:
+    return ImageDeletionRepository(ImageDeletion)
@@ -1,14 +1,96 @@
 from functools import lru_cache
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam, case, func, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from db.repositories.base import BaseRepository
-from db.models.meme import Meme
+from db.repositories.count import get_count_strategy
+from db.models.meme import Meme, SEARCH_CONFIG
+from db.models.meme_version import MemeVersion
 from schemas.meme import CRUDMeme
+from core.settings import settings
+from db.database import get_session, get_read_session, commit
 
 
 
 class MemeRepository(BaseRepository[Meme, CRUDMeme, CRUDMeme]):
-    pass
+    async def get_version(self) -> int:
+        async with get_read_session() as session:
+            version = await session.execute(select(MemeVersion.version).filter(MemeVersion.id == 1))
+            return version.scalars().first() or 0
+
+    async def lock_images(self, image_names: list[str]) -> None:
+        if not image_names:
+            return
+        async with get_session() as session:
+            await session.execute(
+                text(
+                    'SELECT pg_advisory_xact_lock(hashtextextended(name, 0)) '
+                    'FROM (SELECT DISTINCT name FROM unnest(CAST(:image_names AS TEXT[])) AS name ORDER BY name) AS names'
+                ),
+                {'image_names': list(image_names)}
+            )
+
+    async def get_referenced_images(self, image_names: list[str]) -> set[str]:
+        if not image_names:
+            return set()
+        names_param = bindparam('image_names', list(image_names), type_=ARRAY(self.model.image_name.type))
+        query = select(self.model.image_name).filter(self.model.image_name == any_(names_param)).distinct()
+        async with get_session() as session:
+            result = await session.execute(query)
+            return set(result.scalars().all())
+
+    async def update_meme(
+        self,
+        id: UUID,
+        description: str | None=None,
+        image_name: str | None=None,
+        image_url: str | None=None
+    ) -> tuple[Meme, str] | None:
+        values = {}
+        if description:
+            values['description'] = description
+        if image_name is not None:
+            values['image_name'] = image_name
+            values['image_url'] = image_url
+            values['variants'] = case((self.model.image_name == image_name, self.model.variants), else_=None)
+        if not values:
+            meme = await self.get(id)
+            return (meme, meme.image_name) if meme else None
+        return await self.update_returning(id, values, 'image_name')
+
+    async def search(
+        self,
+        text: str,
+        *,
+        cursor: tuple[float, UUID] | None=None,
+        limit: int=100,
+        trigram: bool=False
+    ) -> list[tuple[Meme, float]]:
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, text)
+        matches = self.model.search_vector.op('@@')(ts_query)
+        rank = func.ts_rank_cd(self.model.search_vector, ts_query)
+        if trigram:
+            matches = or_(matches, self.model.description.op('%')(text))
+            rank = rank + func.similarity(self.model.description, text)
+        query = select(self.model, rank.label('rank')).filter(matches).order_by(rank.desc(), self.model.id.desc())
+        if cursor is not None:
+            query = query.filter(tuple_(rank, self.model.id) < tuple_(*cursor))
+        async with get_read_session() as session:
+            result = await session.execute(query.limit(limit))
+            return [(meme, rank) for meme, rank in result.all()]
+
+    async def set_variants(self, id: UUID, image_name: str, variants: dict[str, str] | None) -> bool:
+        async with get_session() as session:
+            result = await session.execute(
+                update(self.model)
+                .filter(self.model.id == id, self.model.image_name == image_name)
+                .values(variants=variants)
+            )
+            await commit(session)
+            return bool(result.rowcount)
 
 @lru_cache
 def get_meme_rep() -> MemeRepository:
-    return MemeRepository(Meme)
\ No newline at end of file
+    return MemeRepository(Meme, get_count_strategy(settings))
\ No newline at end of file
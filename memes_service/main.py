@@ -1,11 +1,31 @@
+from contextlib import asynccontextmanager
+
+import anyio
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.v1.meme import router as router_meme
+from core.middleware import JSONGZipMiddleware
+from core.settings import settings
+from services.storage import get_storage_service
+from services.jobs import get_job_queue
+from services.cleanup import get_image_cleanup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    storage = get_storage_service()
+    storage.open()
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(get_job_queue().run)
+        task_group.start_soon(get_image_cleanup().run)
+        yield
+        task_group.cancel_scope.cancel()
+    await storage.close()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(
     router_meme,
@@ -24,5 +44,12 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+if settings.RESPONSE_GZIP:
+    app.add_middleware(
+        JSONGZipMiddleware,
+        minimum_size=settings.RESPONSE_GZIP_MIN_SIZE,
+        compresslevel=settings.RESPONSE_GZIP_LEVEL
+    )
+
 if __name__=="__main__":
     uvicorn.run("main:app", host='0.0.0.0', port=8000, reload=True)
\ No newline at end of file
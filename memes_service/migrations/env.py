@@ -8,6 +8,8 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 from db.models.meme import Meme
+from db.models.image_deletion import ImageDeletion
+from db.models.meme_version import MemeVersion
 from db.models.base import Base
 from core.settings import settings
 
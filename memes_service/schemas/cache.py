@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+class ImageCacheStats(BaseModel):
+    hits: int = Field(
+        description='Количество попаданий в кэш'
+    )
+    misses: int = Field(
+        description='Количество промахов кэша'
+    )
+    items: int = Field(
+        description='Количество изображений в кэше'
+    )
+    size: int = Field(
+        description='Занятый объем кэша в байтах'
+    )
+    max_size: int = Field(
+        description='Максимальный объем кэша в байтах'
+    )
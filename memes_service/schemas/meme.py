@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -21,6 +22,10 @@ class CRUDMeme(BaseMeme):
     image_name: str = Field(
         description='Название изображения'
     )
+    variants: dict[str, str] | None = Field(
+        description='Ссылки на уменьшенные копии изображения',
+        default=None
+    )
 
 class PaginationMeme(BaseModel):
     list_meme: list[CRUDMeme] = Field(
@@ -34,4 +39,61 @@ class PaginationMeme(BaseModel):
     )
     size: int = Field(
         description='Количество элементов на странице'
-    )
\ No newline at end of file
+    )
+
+class CursorPaginationMeme(BaseModel):
+    list_meme: list[CRUDMeme] = Field(
+        description='Список мемов'
+    )
+    next_cursor: str | None = Field(
+        description='Курсор следующей страницы',
+        default=None
+    )
+    total_pages: int | None = Field(
+        description='Общее количество страниц',
+        default=None
+    )
+    size: int = Field(
+        description='Количество элементов на странице'
+    )
+
+class BatchGetMemeRequest(BaseModel):
+    ids: list[UUID] = Field(
+        description='Идентификаторы мемов',
+        min_length=1,
+        max_length=1000
+    )
+
+class BatchGetMemeResponse(BaseModel):
+    list_meme: list[CRUDMeme] = Field(
+        description='Найденные мемы в порядке запроса'
+    )
+    missing: list[UUID] = Field(
+        description='Идентификаторы ненайденных мемов'
+    )
+
+class BatchCreateMemeResult(BaseModel):
+    index: int = Field(
+        description='Порядковый номер мема в запросе'
+    )
+    meme: CRUDMeme | None = Field(
+        description='Созданный мем',
+        default=None
+    )
+    error: str | None = Field(
+        description='Причина ошибки',
+        default=None
+    )
+
+class BatchCreateMemeResponse(BaseModel):
+    results: list[BatchCreateMemeResult] = Field(
+        description='Результаты по каждому мему в порядке запроса'
+    )
+
+class ExportMeme(CRUDMeme):
+    created_datetime: datetime = Field(
+        description='Дата создания'
+    )
+    cursor: str = Field(
+        description='Курсор для продолжения выгрузки после этой записи'
+    )
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+from core.settings import settings
+
+
+def is_not_modified(headers: dict[str, str], if_none_match: str | None, if_modified_since: str | None) -> bool:
+    etag = headers.get('etag')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or (etag is not None and etag.removeprefix('W/') in tags)
+    last_modified = headers.get('last-modified')
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@dataclass
+class CachedImage:
+    content: bytes
+    headers: dict[str, str]
+    expires_at: float
+
+    def is_not_modified(self, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        return is_not_modified(self.headers, if_none_match, if_modified_since)
+
+
+class ImageCache:
+    def __init__(self, max_bytes: int, max_item_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[str, CachedImage] = OrderedDict()
+
+    def accepts(self, size: int | None) -> bool:
+        return size is not None and 0 <= size <= self.max_item_bytes
+
+    def get(self, key: str) -> CachedImage | None:
+        item = self._items.get(key)
+        if item is None or item.expires_at <= time.monotonic():
+            if item is not None:
+                self.invalidate(key)
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item
+
+    def set(self, key: str, content: bytes, headers: dict[str, str]) -> CachedImage:
+        item = CachedImage(content=content, headers=headers, expires_at=time.monotonic() + self.ttl)
+        if not self.accepts(len(content)):
+            return item
+        self.invalidate(key)
+        self._items[key] = item
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted.content)
+        return item
+
+    def invalidate(self, key: str) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= len(item.content)
+
+    def invalidate_image(self, image_name: str) -> None:
+        for key in [key for key in self._items if key == image_name or key.startswith(f'{image_name}?')]:
+            self.invalidate(key)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'items': len(self._items),
+            'size': self.size,
+            'max_size': self.max_bytes
+        }
+
+
+@lru_cache
+def get_image_cache() -> ImageCache:
+    return ImageCache(
+        max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+        max_item_bytes=settings.IMAGE_CACHE_MAX_ITEM_BYTES,
+        ttl=settings.IMAGE_CACHE_TTL
+    )
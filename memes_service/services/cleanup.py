@@ -0,0 +1,91 @@
+import logging
+from functools import lru_cache
+from uuid import UUID
+
+import anyio
+from fastapi import HTTPException
+from httpx import HTTPError
+
+from core.settings import settings
+from db.database import unit_of_work
+from db.repositories.image_deletion import get_image_deletion_rep, ImageDeletionRepository
+from db.repositories.meme import get_meme_rep, MemeRepository
+from services.cache import get_image_cache, ImageCache
+from services.storage import get_storage_service, StorageService
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCleanup:
+    def __init__(
+        self,
+        deletions: ImageDeletionRepository,
+        memes: MemeRepository,
+        storage: StorageService,
+        image_cache: ImageCache,
+        batch_size: int,
+        interval: float,
+        retry_delay: float,
+        max_retry_delay: float
+    ):
+        self.deletions = deletions
+        self.memes = memes
+        self.storage = storage
+        self.image_cache = image_cache
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.drain()
+            except Exception:
+                logger.exception('Не удалось обработать очередь удаления изображений')
+                claimed = 0
+            if claimed < self.batch_size:
+                await anyio.sleep(self.interval)
+
+    async def drain(self) -> int:
+        deletions = await self.deletions.claim(self.batch_size, self.retry_delay, self.max_retry_delay)
+        if not deletions:
+            return 0
+        ids: dict[str, list[UUID]] = {}
+        for deletion in deletions:
+            ids.setdefault(deletion.image_name, []).append(deletion.id)
+
+        async with unit_of_work():
+            await self.memes.lock_images(list(ids))
+            referenced = await self.memes.get_referenced_images(list(ids))
+            done = [id for image_name in referenced for id in ids[image_name]]
+            image_names = [image_name for image_name in ids if image_name not in referenced]
+            if image_names:
+                try:
+                    errors = await self.storage.remove_files(image_names)
+                except (HTTPException, HTTPError):
+                    logger.warning('Хранилище недоступно, удаление %s изображений отложено', len(image_names))
+                    errors = {image_name: 'Неполадки в работе' for image_name in image_names}
+                for image_name in image_names:
+                    if errors.get(image_name) is None:
+                        done.extend(ids[image_name])
+                        self.image_cache.invalidate_image(image_name)
+                    else:
+                        logger.warning('Не удалось удалить изображение %s: %s', image_name, errors[image_name])
+            await self.deletions.complete(done)
+        return len(deletions)
+
+
+@lru_cache
+def get_image_cleanup() -> ImageCleanup:
+    return ImageCleanup(
+        deletions=get_image_deletion_rep(),
+        memes=get_meme_rep(),
+        storage=get_storage_service(),
+        image_cache=get_image_cache(),
+        batch_size=settings.IMAGE_DELETION_BATCH_SIZE,
+        interval=settings.IMAGE_DELETION_INTERVAL,
+        retry_delay=settings.IMAGE_DELETION_RETRY_DELAY,
+        max_retry_delay=settings.IMAGE_DELETION_MAX_RETRY_DELAY
+    )
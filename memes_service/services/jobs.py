@@ -0,0 +1,118 @@
+from abc import ABC, abstractmethod
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+import anyio
+
+from core.settings import settings, Settings
+from services.variants import VARIANTS_JOB, generate_variants
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class JobBackend(ABC):
+    @abstractmethod
+    async def put(self, job: dict[str, Any]) -> bool:
+        ...
+
+    @abstractmethod
+    async def get(self) -> dict[str, Any]:
+        ...
+
+
+class MemoryJobBackend(JobBackend):
+    def __init__(self, max_size: int):
+        self._send, self._receive = anyio.create_memory_object_stream[dict[str, Any]](max_size)
+
+    async def put(self, job: dict[str, Any]) -> bool:
+        try:
+            self._send.send_nowait(job)
+        except anyio.WouldBlock:
+            return False
+        return True
+
+    async def get(self) -> dict[str, Any]:
+        return await self._receive.receive()
+
+
+class RedisJobBackend(JobBackend):
+    def __init__(self, url: str, queue_name: str):
+        from redis import asyncio as redis
+
+        self.queue_name = queue_name
+        self._redis = redis.from_url(url)
+
+    async def put(self, job: dict[str, Any]) -> bool:
+        await self._redis.rpush(self.queue_name, json.dumps(job))
+        return True
+
+    async def get(self) -> dict[str, Any]:
+        _, job = await self._redis.blpop([self.queue_name], timeout=0)
+        return json.loads(job)
+
+
+class JobQueue:
+    def __init__(self, backend: JobBackend, workers: int, max_attempts: int, retry_delay: float):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._handlers: dict[str, Handler] = {}
+
+    def register(self, name: str, handler: Handler) -> None:
+        self._handlers[name] = handler
+
+    async def submit(self, name: str, **payload: Any) -> bool:
+        if name not in self._handlers:
+            raise ValueError(f'Неизвестная задача: {name}')
+        queued = await self.backend.put({'name': name, 'payload': payload})
+        if not queued:
+            logger.warning('Очередь задач переполнена, задача %s пропущена', name)
+        return queued
+
+    async def run(self) -> None:
+        async with anyio.create_task_group() as task_group:
+            for _ in range(self.workers):
+                task_group.start_soon(self._work)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self.backend.get()
+            await self.execute(job['name'], job['payload'])
+
+    async def execute(self, name: str, payload: dict[str, Any]) -> bool:
+        handler = self._handlers[name]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await handler(**payload)
+                return True
+            except Exception:
+                logger.exception('Задача %s завершилась ошибкой, попытка %s из %s', name, attempt, self.max_attempts)
+                if attempt < self.max_attempts:
+                    await anyio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        return False
+
+
+def get_job_backend(settings: Settings) -> JobBackend:
+    if settings.JOB_BACKEND == 'memory':
+        return MemoryJobBackend(max_size=settings.JOB_QUEUE_SIZE)
+    if settings.JOB_BACKEND == 'redis':
+        return RedisJobBackend(url=settings.JOB_REDIS_URL, queue_name=settings.JOB_QUEUE_NAME)
+    raise ValueError(f'Неизвестная очередь задач: {settings.JOB_BACKEND}')
+
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    queue = JobQueue(
+        backend=get_job_backend(settings),
+        workers=settings.JOB_WORKERS,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        retry_delay=settings.JOB_RETRY_DELAY
+    )
+    queue.register(VARIANTS_JOB, generate_variants)
+    return queue
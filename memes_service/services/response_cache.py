@@ -0,0 +1,123 @@
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+from urllib.parse import urlencode
+
+from core.settings import settings, Settings
+
+
+class ResponseCacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def get_version(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    async def incr_version(self, key: str) -> int:
+        ...
+
+
+class MemoryResponseCacheBackend(ResponseCacheBackend):
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[1] <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._items[key] = (value, time.monotonic() + ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def get_version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    async def incr_version(self, key: str) -> int:
+        self._versions[key] = self._versions.get(key, 0) + 1
+        return self._versions[key]
+
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._redis.set(key, value, px=int(ttl * 1000))
+
+    async def get_version(self, key: str) -> int:
+        return int(await self._redis.get(key) or 0)
+
+    async def incr_version(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+
+class ResponseCache:
+    def __init__(self, backend: ResponseCacheBackend | None, ttl: float, prefix: str='memes'):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @property
+    def version_key(self) -> str:
+        return f'{self.prefix}:version'
+
+    async def version(self) -> int:
+        if self.backend is None:
+            return 0
+        return await self.backend.get_version(self.version_key)
+
+    async def bump(self) -> None:
+        if self.backend is not None:
+            await self.backend.incr_version(self.version_key)
+
+    async def make_key(self, namespace: str, params: dict[str, Any]) -> str:
+        query = urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+        return f'{self.prefix}:{await self.version()}:{namespace}:{query}'
+
+    async def get(self, key: str) -> bytes | None:
+        if self.backend is None:
+            return None
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        if self.backend is not None:
+            await self.backend.set(key, value, self.ttl)
+
+
+def get_response_cache_backend(settings: Settings) -> ResponseCacheBackend | None:
+    if settings.RESPONSE_CACHE_BACKEND == 'none':
+        return None
+    if settings.RESPONSE_CACHE_BACKEND == 'memory':
+        return MemoryResponseCacheBackend(max_items=settings.RESPONSE_CACHE_MAX_ITEMS)
+    if settings.RESPONSE_CACHE_BACKEND == 'redis':
+        return RedisResponseCacheBackend(url=settings.RESPONSE_CACHE_REDIS_URL)
+    raise ValueError(f'Неизвестный кэш ответов: {settings.RESPONSE_CACHE_BACKEND}')
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    return ResponseCache(get_response_cache_backend(settings), ttl=settings.RESPONSE_CACHE_TTL)
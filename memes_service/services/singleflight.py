@@ -0,0 +1,44 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+import anyio
+
+T = TypeVar('T')
+
+
+class _Call:
+    def __init__(self):
+        self.done = anyio.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        call = self._calls.get(key)
+        if call is not None:
+            await call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        call = _Call()
+        self._calls[key] = call
+        try:
+            with anyio.CancelScope(shield=True):
+                call.result = await fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+@lru_cache
+def get_image_flight() -> SingleFlight:
+    return SingleFlight()
@@ -1,7 +1,11 @@
+import time
+from collections import OrderedDict
 from functools import lru_cache
+from typing import BinaryIO
+from urllib.parse import urlencode
 
 from fastapi import HTTPException
-from httpx import AsyncClient, BasicAuth, Response
+from httpx import AsyncClient, BasicAuth, Limits, Response, Timeout
 
 from core.settings import settings, Settings
 
@@ -12,35 +16,125 @@ class StorageService:
         self.get_route = f'{settings.STORAGE_ENDPOINT}{settings.STORAGE_GET_ROUTE}'
         self.put_route = f'{settings.STORAGE_ENDPOINT}{settings.STORAGE_PUT_ROUTE}'
         self.delete_route = f'{settings.STORAGE_ENDPOINT}{settings.STORAGE_DELETE_ROUTE}'
+        self.batch_delete_route = f'{settings.STORAGE_ENDPOINT}{settings.STORAGE_BATCH_DELETE_ROUTE}'
         self.auth = BasicAuth(username=settings.STORAGE_USERNAME, password=settings.STORAGE_PASSWORD)
+        self.limits = Limits(
+            max_connections=settings.STORAGE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.STORAGE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.STORAGE_KEEPALIVE_EXPIRY
+        )
+        self.timeout = Timeout(settings.STORAGE_TIMEOUT, connect=settings.STORAGE_CONNECT_TIMEOUT)
+        self.http2 = settings.STORAGE_HTTP2
+        self.chunk_size = settings.STORAGE_CHUNK_SIZE
+        self.url_refresh_margin = settings.STORAGE_URL_REFRESH_MARGIN
+        self.url_cache_size = settings.STORAGE_URL_CACHE_SIZE
+        self._client: AsyncClient | None = None
+        self._image_urls: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    @property
+    def client(self) -> AsyncClient:
+        return self.open()
+
+    def open(self) -> AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = AsyncClient(
+                auth=self.auth,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def get_image(self, file_name: str) -> bytes:
-        async with AsyncClient(auth=self.auth) as client:
-            url =  f'{self.get_route}{file_name}'
-            response = await client.get(url)
+        url =  f'{self.get_route}{file_name}'
+        response = await self.client.get(url)
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail='Изображение не найдено')
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return response.content
+
+    async def stream_image(
+        self,
+        file_name: str,
+        headers: dict[str, str] | None=None,
+        params: dict[str, str | int] | None=None
+    ) -> Response:
+        request = self.client.build_request('GET', f'{self.get_route}{file_name}', headers=headers, params=params)
+        response = await self.client.send(request, stream=True)
+        if response.status_code not in (200, 206):
+            await response.aclose()
+            if response.status_code == 304:
+                return response
+            if response.status_code == 400:
+                raise HTTPException(status_code=400, detail='Недопустимые параметры изображения')
             if response.status_code == 404:
                 raise HTTPException(status_code=404, detail='Изображение не найдено')
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail='Неполадки в работе')
-            return response.content
+            if response.status_code == 416:
+                raise HTTPException(status_code=416, detail='Запрошенный диапазон недоступен')
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return response
+
+    async def get_image_url(self, file_name: str, params: dict[str, str | int] | None=None) -> str:
+        key = f'{file_name}?{urlencode(params)}' if params else file_name
+        now = time.monotonic()
+        cached = self._image_urls.get(key)
+        if cached is not None and cached[1] - now > self.url_refresh_margin:
+            self._image_urls.move_to_end(key)
+            return cached[0]
 
-    async def put_image(self, file_name: str, image: bytes) -> str:
-        async with AsyncClient(auth=self.auth) as client:
-            file = {'file': (file_name, image)}
-            response = await client.put(self.put_route, files=file)
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail='Неполадки в работе')
-            data = response.json()
-            image_name = data.get('image_name')
-            return image_name
+        response = await self.client.get(f'{self.get_route}{file_name}/url', params=params)
+        if response.status_code == 400:
+            raise HTTPException(status_code=400, detail='Недопустимые параметры изображения')
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        data = response.json()
+        self._image_urls[key] = (data['url'], now + data['expires_in'])
+        while len(self._image_urls) > self.url_cache_size:
+            self._image_urls.popitem(last=False)
+        return data['url']
+
+    async def create_variant(self, file_name: str, params: dict[str, str | int]) -> str:
+        response = await self.client.put(f'{self.get_route}{file_name}/variants', params=params)
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return response.json().get('image_name')
+
+    async def image_exists(self, file_name: str) -> bool:
+        response = await self.client.head(f'{self.get_route}{file_name}')
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return True
+
+    async def put_image(self, file_name: str, image: bytes | BinaryIO, content_addressed: bool=False) -> str:
+        file = {'file': (file_name, image)}
+        params = {'content_addressed': 'true'} if content_addressed else None
+        response = await self.client.put(self.put_route, files=file, params=params)
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        data = response.json()
+        image_name = data.get('image_name')
+        return image_name
 
 
     async def remove_file(self, image_name: str) -> int:
-        async with AsyncClient(auth=self.auth) as client:
-            response = await client.delete(self.delete_route+f'{image_name}')
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail='Неполадки в работе')
-            return response.status_code
+        response = await self.client.delete(self.delete_route+f'{image_name}')
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return response.status_code
+
+    async def remove_files(self, image_names: list[str]) -> dict[str, str | None]:
+        response = await self.client.post(self.batch_delete_route, json={'file_names': image_names})
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return {result['file_name']: result['error'] for result in response.json()['results']}
 
 
 @lru_cache
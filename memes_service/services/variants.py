@@ -0,0 +1,34 @@
+from uuid import UUID
+
+import anyio
+
+from core.settings import settings
+from db.repositories.meme import get_meme_rep
+from services.storage import get_storage_service
+from services.response_cache import get_response_cache
+
+
+VARIANTS_JOB = 'generate_variants'
+
+
+def get_variant_url(image_name: str, width: int, fmt: str) -> str:
+    return f'{settings.SERVICE_IMAGE_ROUTE}{image_name}?w={width}&fmt={fmt}'
+
+
+async def generate_variants(meme_id: str, image_name: str) -> None:
+    storage = get_storage_service()
+    semaphore = anyio.Semaphore(settings.MEME_VARIANT_CONCURRENCY)
+    variants: dict[str, str] = {}
+
+    async def create_variant(width: int, fmt: str) -> None:
+        async with semaphore:
+            await storage.create_variant(image_name, {'w': width, 'fmt': fmt})
+        variants[f'w{width}.{fmt}'] = get_variant_url(image_name, width, fmt)
+
+    async with anyio.create_task_group() as task_group:
+        for width in settings.MEME_VARIANT_WIDTHS:
+            for fmt in settings.MEME_VARIANT_FORMATS:
+                task_group.start_soon(create_variant, width, fmt)
+
+    if await get_meme_rep().set_variants(UUID(meme_id), image_name, variants):
+        await get_response_cache().bump()
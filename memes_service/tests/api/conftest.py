@@ -0,0 +1,9 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from db.repositories.meme import MemeRepository
+
+
+@pytest.fixture(autouse=True)
+def meme_version(mocker: MockerFixture):
+    return mocker.patch.object(MemeRepository, 'get_version', return_value=0)
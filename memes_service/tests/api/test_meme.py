@@ -1,22 +1,34 @@
+import json
 import uuid
+from datetime import datetime
 
 import pytest
 from pytest_mock import MockerFixture
-from httpx import AsyncClient, ASGITransport
+from httpx import AsyncClient, ASGITransport, Response
+from fastapi import HTTPException
 
 from main import app
 from db.repositories.meme import  MemeRepository
+from db.repositories.image_deletion import ImageDeletionRepository
 from services.storage import StorageService
-from schemas.meme import CRUDMeme
+from services.cache import get_image_cache
+from services.response_cache import get_response_cache, ResponseCache
+from db.database import _current_session
+from services.jobs import JobQueue
+from schemas.meme import CRUDMeme, PaginationMeme
+from db.models.meme import Meme
+from core.cursor import encode_cursor, decode_datetime_cursor, decode_rank_cursor
+from core.settings import settings
 
 
 meme = CRUDMeme(id=uuid.uuid4(), description='description', image_url='image_url', image_name='image_name')
+meme_row = meme.model_dump()
 
 
 @pytest.mark.anyio
 async def test_get_memes_200(mocker: MockerFixture):
     mocker.patch.object(MemeRepository, 'count', return_value=2)
-    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme, meme])
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.get('/memes')
@@ -28,12 +40,33 @@ async def test_get_memes_total_pages(mocker: MockerFixture):
     size = 25
 
     mocker.patch.object(MemeRepository, 'count', return_value=total_pages*size)
-    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme, meme])
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.get(f'/memes?size={size}')
     assert response.json()['total_pages'] == total_pages
 
+@pytest.mark.anyio
+async def test_get_memes_columns(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'count', return_value=2)
+    get_multi = mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes?size=2')
+    expected = PaginationMeme(list_meme=[meme, meme], total_pages=1, page=1, size=2)
+    assert response.json() == json.loads(expected.model_dump_json())
+    get_multi.assert_called_once_with(offset=0, limit=2, columns=('id', 'description', 'image_url', 'image_name', 'variants'))
+
+@pytest.mark.anyio
+async def test_get_memes_gzip(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'count', return_value=100)
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row] * 100)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes?size=100', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert len(response.json()['list_meme']) == 100
+
 @pytest.mark.anyio
 async def test_get_memes_404(mocker: MockerFixture):
 
@@ -48,12 +81,61 @@ async def test_get_memes_400(mocker: MockerFixture):
     page = 999
 
     mocker.patch.object(MemeRepository, 'count', return_value=2)
-    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme, meme])
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.get(f'/memes?page={page}')
     assert response.status_code == 400
 
+@pytest.mark.anyio
+async def test_get_memes_cursor_first_page(mocker: MockerFixture):
+    created_datetime = datetime(2024, 7, 16, 13, 56, 49, 458037)
+    db_memes = [
+        Meme(id=uuid.uuid4(), description='description', image_url='image_url', image_name='image_name', created_datetime=created_datetime)
+        for _ in range(3)
+    ]
+    mocker.patch.object(MemeRepository, 'count', return_value=3)
+    get_multi_after = mocker.patch.object(MemeRepository, 'get_multi_after', return_value=db_memes)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes?cursor=&size=2')
+    assert response.status_code == 200
+    assert len(response.json()['list_meme']) == 2
+    assert decode_datetime_cursor(response.json()['next_cursor']) == (created_datetime, db_memes[1].id)
+    get_multi_after.assert_called_once_with(cursor=None, limit=3)
+
+@pytest.mark.anyio
+async def test_get_memes_cursor_next_page(mocker: MockerFixture):
+    created_datetime = datetime(2024, 7, 16, 13, 56, 49, 458037)
+    cursor = encode_cursor(created_datetime, meme.id)
+    mocker.patch.object(MemeRepository, 'count', return_value=3)
+    get_multi_after = mocker.patch.object(MemeRepository, 'get_multi_after', return_value=[meme])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes', params={'cursor': cursor, 'size': 2})
+    assert response.status_code == 200
+    assert response.json()['next_cursor'] is None
+    get_multi_after.assert_called_once_with(cursor=(created_datetime, meme.id), limit=3)
+
+@pytest.mark.anyio
+async def test_get_memes_cursor_without_total(mocker: MockerFixture):
+    count = mocker.patch.object(MemeRepository, 'count', return_value=3)
+    mocker.patch.object(MemeRepository, 'get_multi_after', return_value=[meme])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes?cursor=&with_total=false')
+    assert response.status_code == 200
+    assert response.json()['total_pages'] is None
+    count.assert_not_called()
+
+@pytest.mark.anyio
+async def test_get_memes_cursor_400(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'count', return_value=3)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes?cursor=incorrect')
+    assert response.status_code == 400
+
 @pytest.mark.anyio
 async def test_get_mem_200(mocker: MockerFixture):
     mocker.patch.object(MemeRepository, 'get', return_value=meme)
@@ -70,16 +152,272 @@ async def test_get_mem_404(mocker: MockerFixture):
         response = await client.get(f'/memes/{meme.id}')
     assert response.status_code == 404
 
+@pytest.mark.anyio
+async def test_batch_get_memes_200(mocker: MockerFixture):
+    other = CRUDMeme(id=uuid.uuid4(), description='other', image_url='image_url', image_name='image_name')
+    missing = uuid.uuid4()
+    get_many = mocker.patch.object(MemeRepository, 'get_many', return_value=[meme, other])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        ids = [str(other.id), str(missing), str(meme.id), str(other.id)]
+        response = await client.post('/memes:batchGet', json={'ids': ids})
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['list_meme']] == [str(other.id), str(meme.id)]
+    assert response.json()['missing'] == [str(missing)]
+    get_many.assert_called_once_with([other.id, missing, meme.id])
+
+@pytest.mark.anyio
+async def test_batch_get_memes_422():
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.post('/memes:batchGet', json={'ids': []})
+    assert response.status_code == 422
+
+@pytest.mark.anyio
+async def test_export_memes_200(mocker: MockerFixture):
+    rows = [
+        Meme(id=uuid.uuid4(), description='first', image_url='image_url', image_name='image_name', created_datetime=datetime(2024, 1, 1)),
+        Meme(id=uuid.uuid4(), description='second', image_url='image_url', image_name='image_name', created_datetime=datetime(2024, 1, 2))
+    ]
+
+    async def stream_after(cursor=None, batch_size=1000):
+        for row in rows:
+            yield row
+
+    stream_after = mocker.patch.object(MemeRepository, 'stream_after', side_effect=stream_after)
+    cursor = encode_cursor(datetime(2023, 12, 31), uuid.uuid4())
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes:export', params={'cursor': cursor})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['description'] for line in lines] == ['first', 'second']
+    assert decode_datetime_cursor(lines[-1]['cursor']) == (rows[-1].created_datetime, rows[-1].id)
+    assert stream_after.call_args.kwargs['cursor'] == decode_datetime_cursor(cursor)
+
+@pytest.mark.anyio
+async def test_export_memes_400():
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes:export', params={'cursor': 'bad'})
+    assert response.status_code == 400
+
+@pytest.mark.anyio
+async def test_search_memes_200(mocker: MockerFixture):
+    other = CRUDMeme(id=uuid.uuid4(), description='other', image_url='image_url', image_name='image_name')
+    search = mocker.patch.object(MemeRepository, 'search', return_value=[(meme, 0.5), (other, 0.25), (meme, 0.1)])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes:search', params={'q': 'кот', 'size': 2})
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['list_meme']] == [str(meme.id), str(other.id)]
+    assert decode_rank_cursor(response.json()['next_cursor']) == (0.25, other.id)
+    search.assert_called_once_with('кот', cursor=None, limit=3, trigram=settings.MEME_SEARCH_TRIGRAM)
+
+@pytest.mark.anyio
+async def test_search_memes_400():
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/memes:search', params={'q': 'кот', 'cursor': 'bad'})
+    assert response.status_code == 400
+
+@pytest.mark.anyio
+async def test_get_meme_cached(mocker: MockerFixture):
+    get = mocker.patch.object(MemeRepository, 'get', return_value=meme)
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=meme)
+    mocker.patch.object(ImageDeletionRepository, 'enqueue')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        first = await client.get(f'/memes/{meme.id}')
+        second = await client.get(f'/memes/{meme.id}')
+        assert get.call_count == 1
+        await client.delete(f'/memes/{meme.id}')
+        third = await client.get(f'/memes/{meme.id}')
+    assert first.json() == second.json() == third.json()
+    assert get.call_count == 2
+
+@pytest.mark.anyio
+async def test_get_meme_not_cached_across_bump(mocker: MockerFixture):
+    async def get_during_write(id):
+        await get_response_cache().bump()
+        return meme
+
+    get = mocker.patch.object(MemeRepository, 'get', side_effect=get_during_write)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        await client.get(f'/memes/{meme.id}')
+        await client.get(f'/memes/{meme.id}')
+    assert get.call_count == 2
+
+@pytest.mark.anyio
+async def test_get_memes_304(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'get_version', return_value=7)
+    count = mocker.patch.object(MemeRepository, 'count', return_value=2)
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
+    cache_get = mocker.spy(ResponseCache, 'get')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        first = await client.get('/memes')
+        etag = first.headers['etag']
+        second = await client.get('/memes', headers={'If-None-Match': etag})
+    assert etag == 'W/"7"'
+    assert second.status_code == 304
+    assert second.headers['etag'] == etag
+    assert count.call_count == 1
+    assert cache_get.call_count == 1
+
+@pytest.mark.anyio
+async def test_get_memes_cache_follows_database_version(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'get_version', side_effect=[1, 2])
+    count = mocker.patch.object(MemeRepository, 'count', return_value=2)
+    mocker.patch.object(MemeRepository, 'get_multi', return_value=[meme_row, meme_row])
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        first = await client.get('/memes')
+        second = await client.get('/memes', headers={'If-None-Match': first.headers['etag']})
+    assert second.status_code == 200
+    assert second.headers['etag'] == 'W/"2"'
+    assert count.call_count == 2
+
+@pytest.mark.anyio
+async def test_get_meme_etag_changes_after_update(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'get_version', side_effect=[1, 1, 2])
+    mocker.patch.object(MemeRepository, 'get', return_value=meme)
+    mocker.patch.object(MemeRepository, 'update_meme', return_value=(meme, meme.image_name))
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        first = await client.get(f'/memes/{meme.id}')
+        not_modified = await client.get(f'/memes/{meme.id}', headers={'If-None-Match': first.headers['etag']})
+        await client.put(f'/memes/{meme.id}', data={'description': 'new description'})
+        modified = await client.get(f'/memes/{meme.id}', headers={'If-None-Match': first.headers['etag']})
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified.headers['etag'] != first.headers['etag']
+
 @pytest.mark.anyio
 async def test_post_meme_200(mocker: MockerFixture):
     mocker.patch.object(MemeRepository, 'create', return_value=meme)
     mocker.patch.object(StorageService, 'put_image', return_value='image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'description': 'some description'}
+        file = {'image': ('file name', bytes())}
+        response = await client.post('/memes', data=data, files=file)
+    assert response.status_code == 200
+
+@pytest.mark.anyio
+async def test_post_meme_queues_variants(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'create', return_value=meme)
+    mocker.patch.object(StorageService, 'put_image', return_value='image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    submit = mocker.patch.object(JobQueue, 'submit', return_value=True)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'description': 'some description'}
+        file = {'image': ('file name', bytes())}
+        response = await client.post('/memes', data=data, files=file)
+    assert response.status_code == 200
+    submit.assert_called_once_with('generate_variants', meme_id=str(meme.id), image_name=meme.image_name)
+
+@pytest.mark.anyio
+async def test_post_meme_reuploads_image_deleted_before_lock(mocker: MockerFixture):
+    calls = []
+
+    async def put_image(file_name, image, content_addressed=False):
+        calls.append('put')
+        return 'image_name'
+
+    async def lock_images(image_names):
+        calls.append('lock')
+
+    async def image_exists(image_name):
+        calls.append('exists')
+        return False
+
+    mocker.patch.object(StorageService, 'put_image', side_effect=put_image)
+    mocker.patch.object(MemeRepository, 'lock_images', side_effect=lock_images)
+    mocker.patch.object(StorageService, 'image_exists', side_effect=image_exists)
+    mocker.patch.object(MemeRepository, 'create', return_value=meme)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'description': 'some description'}
+        file = {'image': ('file name', b'image')}
+        response = await client.post('/memes', data=data, files=file)
+    assert response.status_code == 200
+    assert calls == ['put', 'lock', 'exists', 'put']
+
+@pytest.mark.anyio
+async def test_batch_create_memes_reuploads_deleted_images(mocker: MockerFixture):
+    put_image = mocker.patch.object(StorageService, 'put_image', side_effect=lambda file_name, image, content_addressed=False: file_name)
+    lock_images = mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', side_effect=lambda name: name != 'deleted')
+    create_many = mocker.patch.object(MemeRepository, 'create_many', side_effect=lambda memes_in, chunk_size: memes_in)
+    mocker.patch.object(JobQueue, 'submit', return_value=True)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'descriptions': ['first', 'second']}
+        files = [('images', ('kept', b'kept')), ('images', ('deleted', b'deleted'))]
+        response = await client.post('/memes:batchCreate', data=data, files=files)
+    assert response.status_code == 200
+    assert sorted(call.args[0] for call in put_image.call_args_list) == ['deleted', 'deleted', 'kept']
+    assert sorted(lock_images.call_args.args[0]) == ['deleted', 'kept']
+    assert len(create_many.call_args.args[0]) == 2
+
+@pytest.mark.anyio
+async def test_post_meme_survives_post_commit_failure(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'create', return_value=meme)
+    mocker.patch.object(StorageService, 'put_image', return_value='image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    mocker.patch.object(ResponseCache, 'bump', side_effect=ConnectionError('redis'))
+    submit = mocker.patch.object(JobQueue, 'submit', side_effect=ConnectionError('redis'))
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         data = {'description': 'some description'}
         file = {'image': ('file name', bytes())}
         response = await client.post('/memes', data=data, files=file)
     assert response.status_code == 200
+    submit.assert_called_once()
+
+@pytest.mark.anyio
+async def test_batch_create_memes_200(mocker: MockerFixture):
+    async def put_image(file_name, image, content_addressed=False):
+        if file_name == 'broken':
+            raise HTTPException(status_code=500, detail='Неполадки в работе')
+        return file_name
+
+    mocker.patch.object(StorageService, 'put_image', side_effect=put_image)
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    create_many = mocker.patch.object(
+        MemeRepository,
+        'create_many',
+        side_effect=lambda memes_in, chunk_size: [CRUDMeme(id=uuid.uuid4(), **meme_in.model_dump(exclude={'id'})) for meme_in in memes_in]
+    )
+    submit = mocker.patch.object(JobQueue, 'submit', return_value=True)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'descriptions': ['first', 'second', 'third']}
+        files = [('images', ('first', bytes())), ('images', ('broken', bytes())), ('images', ('third', bytes()))]
+        response = await client.post('/memes:batchCreate', data=data, files=files)
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert results[0]['meme']['description'] == 'first'
+    assert results[1]['meme'] is None
+    assert results[1]['error'] == 'Неполадки в работе'
+    assert results[2]['meme']['image_name'] == 'third'
+    assert len(create_many.call_args.args[0]) == 2
+    assert submit.call_count == 2
+
+@pytest.mark.anyio
+async def test_batch_create_memes_400():
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        data = {'descriptions': ['first', 'second']}
+        files = [('images', ('first', bytes()))]
+        response = await client.post('/memes:batchCreate', data=data, files=files)
+    assert response.status_code == 400
 
 @pytest.mark.anyio
 async def test_post_meme_500(mocker: MockerFixture):
@@ -87,12 +425,9 @@ async def test_post_meme_500(mocker: MockerFixture):
     response_mock.status_code = 500
 
     client_mock = mocker.AsyncMock()
-    client_mock.get.return_value = response_mock
-
-    manager_mock = mocker.MagicMock()
-    manager_mock.return_value.__aenter__.return_value = client_mock
+    client_mock.put.return_value = response_mock
 
-    mocker.patch('services.storage.AsyncClient', new=manager_mock)
+    mocker.patch.object(StorageService, 'client', new_callable=mocker.PropertyMock, return_value=client_mock)
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         data = {'description': 'some description'}
         file = {'image': ('file name', bytes())}
@@ -101,9 +436,10 @@ async def test_post_meme_500(mocker: MockerFixture):
 
 @pytest.mark.anyio
 async def test_put_meme_200(mocker: MockerFixture):
-    mocker.patch.object(MemeRepository, 'get', return_value=meme)
     mocker.patch.object(StorageService, 'put_image', return_value='image_name')
-    mocker.patch.object(MemeRepository, 'update', return_value=meme)
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    mocker.patch.object(MemeRepository, 'update_meme', return_value=(meme, meme.image_name))
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         data = {'description': 'some description'}
@@ -113,7 +449,11 @@ async def test_put_meme_200(mocker: MockerFixture):
 
 @pytest.mark.anyio
 async def test_put_meme_404(mocker):
-    mocker.patch.object(MemeRepository, 'get', return_value=None)
+    mocker.patch.object(StorageService, 'put_image', return_value='image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    mocker.patch.object(MemeRepository, 'update_meme', return_value=None)
+    mocker.patch.object(ImageDeletionRepository, 'enqueue')
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         data = {'description': 'some description'}
@@ -123,7 +463,6 @@ async def test_put_meme_404(mocker):
 
 @pytest.mark.anyio
 async def test_put_meme_500(mocker: MockerFixture):
-    mocker.patch.object(MemeRepository, 'get', return_value=meme)
     mock_response = mocker.Mock()
     mock_response.status_code = 500
     mocker.patch.object(AsyncClient, 'put', return_value=mock_response)
@@ -136,79 +475,198 @@ async def test_put_meme_500(mocker: MockerFixture):
 
 @pytest.mark.anyio
 async def test_delete_meme_200(mocker: MockerFixture):
-    mocker.patch.object(MemeRepository, 'get', return_value=meme)
-    mocker.patch.object(StorageService, 'remove_file', return_value=200)
-    mocker.patch.object(MemeRepository, 'remove', return_value=meme.id)
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=meme)
+    mocker.patch.object(ImageDeletionRepository, 'enqueue')
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.delete(f'/memes/{meme.id}')
     assert response.status_code == 200
 
 @pytest.mark.anyio
-async def test_delete_meme_404(mocker: MockerFixture):
-    mocker.patch.object(MemeRepository, 'get', return_value=None)
+async def test_delete_meme_defers_shared_image_to_cleanup(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=meme)
+    enqueue = mocker.patch.object(ImageDeletionRepository, 'enqueue')
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.delete(f'/memes/{meme.id}')
-    assert response.status_code == 404
+    assert response.status_code == 200
+    enqueue.assert_called_once_with(meme.image_name)
 
 @pytest.mark.anyio
-async def test_delete_meme_500(mocker: MockerFixture):
-    mocker.patch.object(MemeRepository, 'get', return_value=meme)
+async def test_put_meme_releases_replaced_image(mocker: MockerFixture):
+    mocker.patch.object(StorageService, 'put_image', return_value='new_image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    update_meme = mocker.patch.object(MemeRepository, 'update_meme', return_value=(meme, meme.image_name))
+    enqueue = mocker.patch.object(ImageDeletionRepository, 'enqueue')
+    mocker.patch.object(JobQueue, 'submit', return_value=True)
 
-    response_mock = mocker.Mock()
-    response_mock.status_code = 500
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        file = {'image': ('file name', bytes())}
+        response = await client.put(f'/memes/{meme.id}', files=file)
+    assert response.status_code == 200
+    update_meme.assert_called_once_with(
+        meme.id,
+        description=None,
+        image_name='new_image_name',
+        image_url=f'{settings.SERVICE_IMAGE_ROUTE}new_image_name'
+    )
+    enqueue.assert_called_once_with(meme.image_name)
 
-    client_mock = mocker.AsyncMock()
-    client_mock.delete.return_value = response_mock
+@pytest.mark.anyio
+async def test_delete_meme_404(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=None)
 
-    manager_mock = mocker.MagicMock()
-    manager_mock.return_value.__aenter__.return_value = client_mock
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.delete(f'/memes/{meme.id}')
+    assert response.status_code == 404
 
-    mocker.patch('services.storage.AsyncClient', new=manager_mock)
+@pytest.mark.anyio
+async def test_delete_meme_does_not_wait_for_storage(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=meme)
+    enqueue = mocker.patch.object(ImageDeletionRepository, 'enqueue')
+    remove_file = mocker.patch.object(StorageService, 'remove_file', side_effect=HTTPException(status_code=500))
+    remove_files = mocker.patch.object(StorageService, 'remove_files', side_effect=HTTPException(status_code=500))
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
         response = await client.delete(f'/memes/{meme.id}')
-    assert response.status_code == 500
+    assert response.status_code == 200
+    enqueue.assert_called_once_with(meme.image_name)
+    remove_file.assert_not_called()
+    remove_files.assert_not_called()
+
+@pytest.mark.anyio
+async def test_put_meme_404_releases_uploaded_image(mocker: MockerFixture):
+    mocker.patch.object(StorageService, 'put_image', return_value='new_image_name')
+    mocker.patch.object(MemeRepository, 'lock_images')
+    mocker.patch.object(StorageService, 'image_exists', return_value=True)
+    mocker.patch.object(MemeRepository, 'update_meme', return_value=None)
+    enqueue = mocker.patch.object(ImageDeletionRepository, 'enqueue')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        file = {'image': ('file name', bytes())}
+        response = await client.put(f'/memes/{meme.id}', files=file)
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'Мем не найден'}
+    enqueue.assert_called_once_with('new_image_name')
 
 @pytest.mark.anyio
 async def test_get_image_200(mocker: MockerFixture):
-    mocker.patch.object(StorageService, 'get_image', return_value=bytes())
+    image = Response(200, content=b'image', headers={'Content-Length': '5'})
+    mocker.patch.object(StorageService, 'stream_image', return_value=image)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name')
+    assert response.status_code == 200
+    assert response.content == b'image'
+    assert image.is_closed
+
+@pytest.mark.anyio
+async def test_get_image_not_gzipped(mocker: MockerFixture):
+    content = b'image' * 1000
+    mocker.patch.object(StorageService, 'stream_image', return_value=Response(200, content=content, headers={'Content-Length': str(len(content))}))
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.content == content
+
+@pytest.mark.anyio
+async def test_get_image_cached(mocker: MockerFixture):
+    headers = {'Content-Length': '5', 'ETag': '"etag"'}
+    stream_image = mocker.patch.object(StorageService, 'stream_image', side_effect=lambda *args, **kwargs: Response(200, content=b'image', headers=headers))
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        first = await client.get('/images/file_name')
+        second = await client.get('/images/file_name')
+        not_modified = await client.get('/images/file_name', headers={'If-None-Match': '"etag"'})
+        stats = await client.get('/cache/images')
+    assert first.content == second.content == b'image'
+    assert not_modified.status_code == 304
+    assert stream_image.call_count == 1
+    assert stats.json()['hits'] == 2
+
+@pytest.mark.anyio
+async def test_get_image_variant(mocker: MockerFixture):
+    headers = {'Content-Length': '5'}
+    stream_image = mocker.patch.object(StorageService, 'stream_image', side_effect=lambda *args, **kwargs: Response(200, content=b'thumb', headers=headers))
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name', params={'w': 320, 'fmt': 'webp'})
+    assert response.content == b'thumb'
+    stream_image.assert_called_once_with('file_name', params={'w': 320, 'fmt': 'webp'})
+    assert get_image_cache().get('file_name?w=320&fmt=webp') is not None
+    assert get_image_cache().get('file_name') is None
+
+@pytest.mark.anyio
+async def test_delete_meme_invalidates_image_cache(mocker: MockerFixture):
+    mocker.patch.object(MemeRepository, 'remove_returning', return_value=meme)
+    mocker.patch.object(ImageDeletionRepository, 'enqueue')
+    get_image_cache().set(meme.image_name, b'image', {})
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
-        response = await client.get('/file_name')
+        response = await client.delete(f'/memes/{meme.id}')
     assert response.status_code == 200
+    assert get_image_cache().get(meme.image_name) is None
+
+@pytest.mark.anyio
+async def test_get_image_redirect(mocker: MockerFixture):
+    mocker.patch.object(settings, 'IMAGE_DELIVERY', 'redirect')
+    mocker.patch.object(StorageService, 'get_image_url', return_value='http://minio/bucket/file_name?signature')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name')
+    assert response.status_code == 302
+    assert response.headers['location'] == 'http://minio/bucket/file_name?signature'
+
+@pytest.mark.anyio
+async def test_get_image_206(mocker: MockerFixture):
+    headers = {'Content-Length': '2', 'Content-Range': 'bytes 2-3/5', 'ETag': '"etag"'}
+    image = Response(206, content=b'ag', headers=headers)
+    stream_image = mocker.patch.object(StorageService, 'stream_image', return_value=image)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name', headers={'Range': 'bytes=2-3'})
+    assert response.status_code == 206
+    assert response.content == b'ag'
+    assert response.headers['content-range'] == 'bytes 2-3/5'
+    assert response.headers['etag'] == '"etag"'
+    stream_image.assert_called_once_with('file_name', headers={'Range': 'bytes=2-3'})
+
+@pytest.mark.anyio
+async def test_get_image_304(mocker: MockerFixture):
+    image = Response(304, headers={'ETag': '"etag"'})
+    mocker.patch.object(StorageService, 'stream_image', return_value=image)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
+        response = await client.get('/images/file_name', headers={'If-None-Match': '"etag"'})
+    assert response.status_code == 304
+    assert response.headers['etag'] == '"etag"'
 
 @pytest.mark.anyio
 async def test_get_image_404(mocker: MockerFixture):
-    response_mock = mocker.Mock()
+    response_mock = mocker.AsyncMock()
     response_mock.status_code = 404
 
-    client_mock = mocker.AsyncMock()
-    client_mock.get.return_value = response_mock
-
-    manager_mock = mocker.MagicMock()
-    manager_mock.return_value.__aenter__.return_value = client_mock
+    client_mock = mocker.MagicMock()
+    client_mock.send = mocker.AsyncMock(return_value=response_mock)
 
-    mocker.patch('services.storage.AsyncClient', new=manager_mock)
+    mocker.patch.object(StorageService, 'client', new_callable=mocker.PropertyMock, return_value=client_mock)
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
-        response = await client.get('/file_name')
+        response = await client.get('/images/file_name')
     assert response.status_code == 404
 
 @pytest.mark.anyio
 async def test_get_image_500(mocker: MockerFixture):
-    response_mock = mocker.Mock()
+    response_mock = mocker.AsyncMock()
     response_mock.status_code = 500
 
-    client_mock = mocker.AsyncMock()
-    client_mock.get.return_value = response_mock
-
-    manager_mock = mocker.MagicMock()
-    manager_mock.return_value.__aenter__.return_value = client_mock
+    client_mock = mocker.MagicMock()
+    client_mock.send = mocker.AsyncMock(return_value=response_mock)
 
-    mocker.patch('services.storage.AsyncClient', new=manager_mock)
+    mocker.patch.object(StorageService, 'client', new_callable=mocker.PropertyMock, return_value=client_mock)
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1") as client:
-        response = await client.get('/file_name')
+        response = await client.get('/images/file_name')
     assert response.status_code == 500
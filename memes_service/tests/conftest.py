@@ -0,0 +1,27 @@
+import pytest
+
+from services.cache import get_image_cache
+from services.jobs import get_job_queue
+from services.response_cache import get_response_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_image_cache():
+    get_image_cache.cache_clear()
+    yield
+    get_image_cache.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_job_queue():
+    get_job_queue.cache_clear()
+    yield
+    get_job_queue.cache_clear()
+
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    get_response_cache.cache_clear()
+    yield
+    get_response_cache.cache_clear()
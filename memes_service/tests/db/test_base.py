@@ -0,0 +1,139 @@
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.dialects import postgresql
+
+from db.database import unit_of_work
+from db.models.meme import Meme
+from db.repositories.base import BaseRepository
+from schemas.meme import CRUDMeme
+
+
+def mock_session(mocker: MockerFixture, session):
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    mocker.patch('db.repositories.base.get_session', get_session)
+    mocker.patch('db.repositories.base.get_read_session', get_session)
+
+
+@pytest.mark.anyio
+async def test_get_many_empty(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    mock_session(mocker, session)
+
+    assert await BaseRepository(Meme).get_many([]) == []
+    session.execute.assert_not_called()
+
+@pytest.mark.anyio
+async def test_get_many_single_query(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock()
+    mock_session(mocker, session)
+    ids = [uuid.uuid4(), uuid.uuid4()]
+
+    await BaseRepository(Meme).get_many(ids)
+
+    query = session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect())
+    assert 'meme.id = ANY ($1::UUID[])' in str(query)
+    assert list(query.params.values()) == [ids]
+    session.execute.assert_called_once()
+
+@pytest.mark.anyio
+async def test_create_many_chunks(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.scalars.side_effect = lambda query, rows: mocker.Mock(all=mocker.Mock(return_value=rows))
+    mock_session(mocker, session)
+    counter = mocker.Mock()
+    memes_in = [CRUDMeme(description=str(index), image_url='image_url', image_name='image_name') for index in range(5)]
+
+    result = await BaseRepository(Meme, counter).create_many(memes_in, chunk_size=2)
+
+    assert [meme['description'] for meme in result] == ['0', '1', '2', '3', '4']
+    assert [len(call.args[1]) for call in session.scalars.call_args_list] == [2, 2, 1]
+    assert session.scalars.call_args.args[0]._sort_by_parameter_order
+    assert 'id' not in session.scalars.call_args.args[1][0]
+    assert session.commit.call_count == 3
+    assert sum(call.args[0] for call in counter.on_create.call_args_list) == 5
+
+@pytest.mark.anyio
+async def test_get_multi_columns(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock(mappings=mocker.Mock(return_value=[{'id': 1, 'description': 'description'}]))
+    mock_session(mocker, session)
+
+    result = await BaseRepository(Meme).get_multi(limit=10, columns=('id', 'description'))
+
+    query = str(session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert result == [{'id': 1, 'description': 'description'}]
+    assert query.startswith('SELECT meme.id, meme.description \nFROM meme')
+
+@pytest.mark.anyio
+async def test_stream_after_uses_server_side_cursor(mocker: MockerFixture):
+    async def rows():
+        yield 'first'
+        yield 'second'
+
+    session = mocker.AsyncMock()
+    session.stream_scalars.return_value = rows()
+    mock_session(mocker, session)
+
+    result = [row async for row in BaseRepository(Meme).stream_after(batch_size=10)]
+
+    query = session.stream_scalars.call_args.args[0]
+    assert result == ['first', 'second']
+    assert query.get_execution_options()['yield_per'] == 10
+
+@pytest.mark.anyio
+async def test_update_returning_old_columns(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock(first=mocker.Mock(return_value=('meme', 'old_name')))
+    mock_session(mocker, session)
+
+    result = await BaseRepository(Meme).update_returning(uuid.uuid4(), {'image_name': 'new_name'}, 'image_name')
+
+    query = str(session.execute.call_args.args[0].element.compile(dialect=postgresql.asyncpg.dialect()))
+    assert result == ('meme', 'old_name')
+    assert query.startswith('WITH previous AS')
+    assert 'FROM meme \nWHERE meme.id = $2::UUID FOR UPDATE)' in query
+    assert 'UPDATE meme SET image_name=$1::VARCHAR FROM previous WHERE' in query
+    assert 'RETURNING' in query and 'previous.image_name AS old_image_name' in query
+    session.execute.assert_called_once()
+
+@pytest.mark.anyio
+async def test_remove_returning(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock()
+    session.execute.return_value.scalars.return_value.first.return_value = 'meme'
+    mock_session(mocker, session)
+    counter = mocker.Mock()
+
+    assert await BaseRepository(Meme, counter).remove_returning(uuid.uuid4()) == 'meme'
+    counter.on_remove.assert_called_once()
+    session.execute.assert_called_once()
+
+@pytest.mark.anyio
+async def test_count_tracked_after_commit(mocker: MockerFixture):
+    def make_session():
+        session = mocker.AsyncMock()
+        session.info = {}
+        session.execute.return_value = mocker.Mock(rowcount=1)
+        return session
+
+    mocker.patch('db.database.session_factory', side_effect=make_session)
+    counter = mocker.Mock()
+    repository = BaseRepository(Meme, counter)
+
+    with pytest.raises(ValueError):
+        async with unit_of_work():
+            await repository.remove(uuid.uuid4())
+            raise ValueError
+    counter.on_remove.assert_not_called()
+
+    async with unit_of_work():
+        await repository.remove(uuid.uuid4())
+        counter.on_remove.assert_not_called()
+    counter.on_remove.assert_called_once_with(1)
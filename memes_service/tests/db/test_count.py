@@ -0,0 +1,65 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from db.repositories.count import CachedCount, TrackedCount, EstimatedCount
+
+
+@pytest.mark.anyio
+async def test_cached_count_uses_cache(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_exact.return_value = 10
+    counter = CachedCount(ttl=60)
+
+    assert await counter.count(repository) == 10
+    assert await counter.count(repository) == 10
+    repository.count_exact.assert_called_once()
+
+@pytest.mark.anyio
+async def test_cached_count_expires(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_exact.side_effect = [10, 20]
+    counter = CachedCount(ttl=0)
+
+    assert await counter.count(repository) == 10
+    assert await counter.count(repository) == 20
+
+@pytest.mark.anyio
+async def test_tracked_count(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_exact.return_value = 10
+    counter = TrackedCount(resync_interval=60)
+
+    assert await counter.count(repository) == 10
+    counter.on_create()
+    counter.on_create()
+    counter.on_remove()
+    assert await counter.count(repository) == 11
+    repository.count_exact.assert_called_once()
+
+@pytest.mark.anyio
+async def test_estimated_count(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_estimate.return_value = 100000
+    counter = EstimatedCount(exact_below=1000)
+
+    assert await counter.count(repository) == 100000
+    repository.count_exact.assert_not_called()
+
+@pytest.mark.anyio
+async def test_estimated_count_small_table(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_estimate.return_value = -1
+    repository.count_exact.return_value = 5
+    counter = EstimatedCount(exact_below=1000)
+
+    assert await counter.count(repository) == 5
+
+@pytest.mark.anyio
+async def test_tracked_count_resyncs(mocker: MockerFixture):
+    repository = mocker.AsyncMock()
+    repository.count_exact.side_effect = [10, 7]
+    counter = TrackedCount(resync_interval=0)
+
+    assert await counter.count(repository) == 10
+    counter.on_create()
+    assert await counter.count(repository) == 7
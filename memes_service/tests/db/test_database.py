@@ -0,0 +1,122 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from db.database import get_session, get_read_session, unit_of_work, commit, on_commit, ReplicaHealth
+
+
+def mock_session_factory(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.info = {}
+    factory = mocker.patch('db.database.session_factory', return_value=session)
+    return factory, session
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_shares_session(mocker: MockerFixture):
+    factory, session = mock_session_factory(mocker)
+    callback = mocker.AsyncMock()
+
+    async with unit_of_work() as current:
+        async with get_session() as first:
+            await commit(first)
+        async with get_session() as second:
+            await commit(second)
+        await on_commit(callback)
+        callback.assert_not_called()
+
+    assert current is first is second is session
+    factory.assert_called_once()
+    assert session.flush.call_count == 2
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+    callback.assert_called_once()
+
+@pytest.mark.anyio
+async def test_unit_of_work_rolls_back(mocker: MockerFixture):
+    _, session = mock_session_factory(mocker)
+    callback = mocker.AsyncMock()
+
+    with pytest.raises(ValueError):
+        async with unit_of_work():
+            await on_commit(callback)
+            raise ValueError
+
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+    callback.assert_not_called()
+
+@pytest.mark.anyio
+async def test_unit_of_work_callback_errors_are_isolated(mocker: MockerFixture):
+    _, session = mock_session_factory(mocker)
+    failing = mocker.AsyncMock(side_effect=ConnectionError('redis'))
+    callback = mocker.AsyncMock()
+
+    async with unit_of_work():
+        await on_commit(failing)
+        await on_commit(callback)
+
+    session.commit.assert_called_once()
+    failing.assert_called_once()
+    callback.assert_called_once()
+
+@pytest.mark.anyio
+async def test_get_session_without_unit_of_work(mocker: MockerFixture):
+    _, session = mock_session_factory(mocker)
+    callback = mocker.AsyncMock()
+
+    async with get_session() as current:
+        await commit(current)
+    await on_commit(callback)
+
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+    callback.assert_called_once()
+
+@pytest.mark.anyio
+async def test_read_session_uses_replica(mocker: MockerFixture):
+    factory, primary = mock_session_factory(mocker)
+    replica = mocker.AsyncMock()
+    mocker.patch('db.database.replica_session_factory', return_value=replica)
+    health = mocker.patch('db.database.replica_health')
+    health.is_healthy = mocker.AsyncMock(return_value=True)
+
+    async with get_read_session() as session:
+        assert session is replica
+    replica.close.assert_called_once()
+    factory.assert_not_called()
+
+@pytest.mark.anyio
+async def test_read_session_falls_back_to_primary(mocker: MockerFixture):
+    _, primary = mock_session_factory(mocker)
+    replica_factory = mocker.patch('db.database.replica_session_factory')
+    health = mocker.patch('db.database.replica_health')
+    health.is_healthy = mocker.AsyncMock(return_value=False)
+
+    async with get_read_session() as session:
+        assert session is primary
+    replica_factory.assert_not_called()
+
+@pytest.mark.anyio
+async def test_read_session_reads_own_writes(mocker: MockerFixture):
+    _, primary = mock_session_factory(mocker)
+    replica = mocker.AsyncMock()
+    mocker.patch('db.database.replica_session_factory', return_value=replica)
+    health = mocker.patch('db.database.replica_health')
+    health.is_healthy = mocker.AsyncMock(return_value=True)
+
+    async with unit_of_work() as current:
+        async with get_read_session() as session:
+            assert session is replica
+        await commit(current)
+        async with get_read_session() as session:
+            assert session is primary
+
+@pytest.mark.anyio
+async def test_replica_health_caches_result(mocker: MockerFixture):
+    engine = mocker.MagicMock()
+    engine.connect.return_value.__aenter__.return_value.execute = mocker.AsyncMock(side_effect=OSError)
+    health = ReplicaHealth(engine, interval=60, timeout=1)
+
+    assert not await health.is_healthy()
+    assert not await health.is_healthy()
+    engine.connect.assert_called_once()
@@ -0,0 +1,41 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.dialects import postgresql
+
+from db.models.image_deletion import ImageDeletion
+from db.repositories.image_deletion import ImageDeletionRepository
+
+
+def mock_session(mocker: MockerFixture, session):
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    mocker.patch('db.repositories.image_deletion.get_session', get_session)
+
+
+@pytest.mark.anyio
+async def test_claim_leases_pending_rows(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock()
+    mock_session(mocker, session)
+
+    await ImageDeletionRepository(ImageDeletion).claim(10, retry_delay=30, max_retry_delay=3600)
+
+    query = str(session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert 'FOR UPDATE SKIP LOCKED' in query
+    assert 'attempts=(image_deletion.attempts + $1::INTEGER)' in query
+    assert 'least($3::INTERVAL * power($4::INTEGER, image_deletion.attempts), $5::INTERVAL)' in query
+    assert 'RETURNING image_deletion.id, image_deletion.image_name' in query
+    session.commit.assert_called_once()
+
+@pytest.mark.anyio
+async def test_complete_empty(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    mock_session(mocker, session)
+
+    await ImageDeletionRepository(ImageDeletion).complete([])
+
+    session.execute.assert_not_called()
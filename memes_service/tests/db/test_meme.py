@@ -0,0 +1,83 @@
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.dialects import postgresql
+
+from db.models.meme import Meme
+from db.repositories.meme import MemeRepository
+
+
+def mock_read_session(mocker: MockerFixture, session):
+    @asynccontextmanager
+    async def get_read_session():
+        yield session
+
+    mocker.patch('db.repositories.meme.get_read_session', get_read_session)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('trigram', [False, True])
+async def test_search_query(mocker: MockerFixture, trigram: bool):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock(all=mocker.Mock(return_value=[('meme', 0.5)]))
+    mock_read_session(mocker, session)
+
+    result = await MemeRepository(Meme).search('кот', cursor=(0.5, uuid.uuid4()), limit=10, trigram=trigram)
+
+    query = str(session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert result == [('meme', 0.5)]
+    assert 'meme.search_vector @@ websearch_to_tsquery' in query
+    assert 'ts_rank_cd(meme.search_vector' in query
+    assert ('meme.description %' in query) is trigram
+    assert ('similarity(meme.description' in query) is trigram
+
+@pytest.mark.anyio
+async def test_get_referenced_images(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock(scalars=mocker.Mock(return_value=mocker.Mock(all=mocker.Mock(return_value=['first']))))
+
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    mocker.patch('db.repositories.meme.get_session', get_session)
+
+    result = await MemeRepository(Meme).get_referenced_images(['first', 'second'])
+
+    query = str(session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert result == {'first'}
+    assert 'meme.image_name = ANY ($1::VARCHAR(255)[])' in query
+
+@pytest.mark.anyio
+async def test_lock_images(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    mocker.patch('db.repositories.meme.get_session', get_session)
+
+    await MemeRepository(Meme).lock_images(['second', 'first'])
+
+    query, params = session.execute.call_args.args
+    assert 'pg_advisory_xact_lock(hashtextextended(name, 0))' in str(query)
+    assert 'ORDER BY name' in str(query)
+    assert params == {'image_names': ['second', 'first']}
+
+@pytest.mark.anyio
+async def test_get_version(mocker: MockerFixture):
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.MagicMock(scalars=mocker.Mock(return_value=mocker.Mock(first=mocker.Mock(return_value=7))))
+
+    @asynccontextmanager
+    async def get_read_session():
+        yield session
+
+    mocker.patch('db.repositories.meme.get_read_session', get_read_session)
+
+    assert await MemeRepository(Meme).get_version() == 7
+    query = str(session.execute.call_args.args[0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert 'FROM meme_version' in query
@@ -0,0 +1,67 @@
+from services.cache import ImageCache
+
+
+def test_get_returns_cached_image():
+    cache = ImageCache(max_bytes=10, max_item_bytes=10, ttl=60)
+    cache.set('name', b'image', {'etag': '"etag"'})
+
+    item = cache.get('name')
+
+    assert item.content == b'image'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['size'] == 5
+
+def test_evicts_least_recently_used_by_size():
+    cache = ImageCache(max_bytes=10, max_item_bytes=10, ttl=60)
+    cache.set('first', b'1234', {})
+    cache.set('second', b'1234', {})
+    cache.get('first')
+    cache.set('third', b'1234', {})
+
+    assert cache.get('second') is None
+    assert cache.get('first') is not None
+    assert cache.get('third') is not None
+    assert cache.size == 8
+
+def test_skips_large_items():
+    cache = ImageCache(max_bytes=10, max_item_bytes=4, ttl=60)
+    cache.set('name', b'12345', {})
+
+    assert cache.get('name') is None
+    assert cache.size == 0
+
+def test_expired_item_is_miss():
+    cache = ImageCache(max_bytes=10, max_item_bytes=10, ttl=0)
+    cache.set('name', b'image', {})
+
+    assert cache.get('name') is None
+    assert cache.size == 0
+    assert cache.stats()['misses'] == 1
+
+def test_invalidate():
+    cache = ImageCache(max_bytes=10, max_item_bytes=10, ttl=60)
+    cache.set('name', b'image', {})
+    cache.invalidate('name')
+
+    assert cache.get('name') is None
+    assert cache.size == 0
+
+def test_invalidate_image():
+    cache = ImageCache(max_bytes=20, max_item_bytes=10, ttl=60)
+    cache.set('name', b'image', {})
+    cache.set('name?w=320', b'image', {})
+    cache.set('name_other', b'image', {})
+    cache.invalidate_image('name')
+
+    assert cache.get('name') is None
+    assert cache.get('name?w=320') is None
+    assert cache.get('name_other') is not None
+
+def test_is_not_modified():
+    cache = ImageCache(max_bytes=10, max_item_bytes=10, ttl=60)
+    item = cache.set('name', b'image', {'etag': '"etag"', 'last-modified': 'Tue, 16 Jul 2024 13:56:49 GMT'})
+
+    assert item.is_not_modified('"other", W/"etag"', None)
+    assert not item.is_not_modified('"other"', None)
+    assert item.is_not_modified(None, 'Tue, 16 Jul 2024 13:56:49 GMT')
+    assert not item.is_not_modified(None, 'Mon, 15 Jul 2024 13:56:49 GMT')
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+from pytest_mock import MockerFixture
+from fastapi import HTTPException
+
+from db.database import _current_session
+from db.models.image_deletion import ImageDeletion
+from services.cache import ImageCache
+from services.cleanup import ImageCleanup
+
+
+def make_cleanup(mocker: MockerFixture, image_names: list[str], referenced: set[str]) -> ImageCleanup:
+    deletions = mocker.AsyncMock()
+    deletions.claim.return_value = [ImageDeletion(id=uuid.uuid4(), image_name=image_name) for image_name in image_names]
+    memes = mocker.AsyncMock()
+    memes.get_referenced_images.return_value = referenced
+    return ImageCleanup(
+        deletions=deletions,
+        memes=memes,
+        storage=mocker.AsyncMock(),
+        image_cache=ImageCache(max_bytes=100, max_item_bytes=100, ttl=60),
+        batch_size=10,
+        interval=0,
+        retry_delay=1,
+        max_retry_delay=10
+    )
+
+def completed(cleanup: ImageCleanup) -> list[str]:
+    claimed = {deletion.id: deletion.image_name for deletion in cleanup.deletions.claim.return_value}
+    return sorted(claimed[id] for id in cleanup.deletions.complete.call_args.args[0])
+
+
+@pytest.mark.anyio
+async def test_drain_empty(mocker: MockerFixture):
+    cleanup = make_cleanup(mocker, [], set())
+
+    assert await cleanup.drain() == 0
+    cleanup.storage.remove_files.assert_not_called()
+    cleanup.deletions.complete.assert_not_called()
+
+@pytest.mark.anyio
+async def test_drain_removes_unreferenced(mocker: MockerFixture):
+    cleanup = make_cleanup(mocker, ['first', 'first', 'second', 'shared'], {'shared'})
+    cleanup.storage.remove_files.return_value = {'first': None, 'second': None}
+    cleanup.image_cache.set('first?w=320', b'image', {})
+
+    assert await cleanup.drain() == 4
+    cleanup.storage.remove_files.assert_called_once_with(['first', 'second'])
+    assert completed(cleanup) == ['first', 'first', 'second', 'shared']
+    assert cleanup.image_cache.get('first?w=320') is None
+
+@pytest.mark.anyio
+async def test_drain_keeps_failed(mocker: MockerFixture):
+    cleanup = make_cleanup(mocker, ['first', 'second'], set())
+    cleanup.storage.remove_files.return_value = {'first': None, 'second': 'Access Denied'}
+
+    await cleanup.drain()
+
+    assert completed(cleanup) == ['first']
+
+@pytest.mark.anyio
+async def test_drain_storage_unavailable(mocker: MockerFixture):
+    cleanup = make_cleanup(mocker, ['first', 'shared'], {'shared'})
+    cleanup.storage.remove_files.side_effect = HTTPException(status_code=500)
+
+    await cleanup.drain()
+
+    assert completed(cleanup) == ['shared']
+
+@pytest.mark.anyio
+async def test_drain_holds_lock_until_removed(mocker: MockerFixture):
+    cleanup = make_cleanup(mocker, ['first'], set())
+    calls = []
+
+    def record(name, result=None):
+        def side_effect(*args):
+            calls.append((name, _current_session.get() is not None))
+            return result
+        return side_effect
+
+    cleanup.memes.lock_images.side_effect = record('lock')
+    cleanup.memes.get_referenced_images.side_effect = record('referenced', set())
+    cleanup.storage.remove_files.side_effect = record('remove', {'first': None})
+    cleanup.deletions.complete.side_effect = record('complete')
+
+    await cleanup.drain()
+
+    assert calls == [('lock', True), ('referenced', True), ('remove', True), ('complete', True)]
+    cleanup.memes.lock_images.assert_called_once_with(['first'])
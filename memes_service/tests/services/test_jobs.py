@@ -0,0 +1,75 @@
+import anyio
+import pytest
+from pytest_mock import MockerFixture
+
+from services.jobs import JobBackend, JobQueue, MemoryJobBackend
+
+
+def make_queue(max_size: int=10) -> JobQueue:
+    return JobQueue(backend=MemoryJobBackend(max_size=max_size), workers=2, max_attempts=3, retry_delay=0)
+
+
+@pytest.mark.anyio
+async def test_submit_unknown_job():
+    queue = make_queue()
+
+    with pytest.raises(ValueError):
+        await queue.submit('unknown')
+
+@pytest.mark.anyio
+async def test_submit_full_queue(mocker: MockerFixture):
+    queue = make_queue(max_size=1)
+    queue.register('job', mocker.AsyncMock())
+
+    assert await queue.submit('job', value=1)
+    assert not await queue.submit('job', value=2)
+
+@pytest.mark.anyio
+async def test_execute_retries(mocker: MockerFixture):
+    queue = make_queue()
+    handler = mocker.AsyncMock(side_effect=[Exception('error'), None])
+    queue.register('job', handler)
+
+    assert await queue.execute('job', {'value': 1})
+    assert handler.call_count == 2
+
+@pytest.mark.anyio
+async def test_execute_gives_up(mocker: MockerFixture):
+    queue = make_queue()
+    handler = mocker.AsyncMock(side_effect=Exception('error'))
+    queue.register('job', handler)
+
+    assert not await queue.execute('job', {})
+    assert handler.call_count == queue.max_attempts
+
+@pytest.mark.anyio
+async def test_run_processes_jobs():
+    queue = make_queue()
+    done = anyio.Event()
+    values = []
+
+    async def handler(value):
+        values.append(value)
+        if len(values) == 2:
+            done.set()
+
+    queue.register('job', handler)
+    await queue.submit('job', value=1)
+    await queue.submit('job', value=2)
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(queue.run)
+        with anyio.fail_after(1):
+            await done.wait()
+        task_group.cancel_scope.cancel()
+
+    assert sorted(values) == [1, 2]
+
+
+def test_job_backend_requires_all_methods():
+    class PutOnlyBackend(JobBackend):
+        async def put(self, job):
+            return True
+
+    with pytest.raises(TypeError):
+        PutOnlyBackend()
@@ -0,0 +1,63 @@
+import pytest
+
+from services.response_cache import ResponseCache, ResponseCacheBackend, MemoryResponseCacheBackend
+
+
+@pytest.mark.anyio
+async def test_response_cache_hit():
+    cache = ResponseCache(MemoryResponseCacheBackend(max_items=10), ttl=60)
+    await cache.set(await cache.make_key('memes', {'page': 1, 'size': 50}), b'page')
+
+    assert await cache.get(await cache.make_key('memes', {'size': 50, 'page': 1})) == b'page'
+    assert await cache.get(await cache.make_key('memes', {'page': 2, 'size': 50})) is None
+
+@pytest.mark.anyio
+async def test_response_cache_bump_invalidates():
+    cache = ResponseCache(MemoryResponseCacheBackend(max_items=10), ttl=60)
+    await cache.set(await cache.make_key('meme', {'id': 1}), b'meme')
+    await cache.bump()
+
+    assert await cache.version() == 1
+    assert await cache.get(await cache.make_key('meme', {'id': 1})) is None
+
+@pytest.mark.anyio
+async def test_response_cache_result_computed_across_bump_is_stale():
+    cache = ResponseCache(MemoryResponseCacheBackend(max_items=10), ttl=60)
+    key = await cache.make_key('meme', {'id': 1})
+    assert await cache.get(key) is None
+    await cache.bump()
+    await cache.set(key, b'stale')
+
+    assert await cache.get(await cache.make_key('meme', {'id': 1})) is None
+
+@pytest.mark.anyio
+async def test_response_cache_expires():
+    cache = ResponseCache(MemoryResponseCacheBackend(max_items=10), ttl=0)
+    await cache.set(await cache.make_key('meme', {'id': 1}), b'meme')
+
+    assert await cache.get(await cache.make_key('meme', {'id': 1})) is None
+
+@pytest.mark.anyio
+async def test_response_cache_evicts_oldest():
+    cache = ResponseCache(MemoryResponseCacheBackend(max_items=2), ttl=60)
+    for id in range(3):
+        await cache.set(await cache.make_key('meme', {'id': id}), b'meme')
+
+    assert await cache.get(await cache.make_key('meme', {'id': 0})) is None
+    assert await cache.get(await cache.make_key('meme', {'id': 2})) == b'meme'
+
+@pytest.mark.anyio
+async def test_response_cache_disabled():
+    cache = ResponseCache(None, ttl=60)
+    await cache.set(await cache.make_key('meme', {'id': 1}), b'meme')
+    await cache.bump()
+
+    assert await cache.get(await cache.make_key('meme', {'id': 1})) is None
+
+def test_response_cache_backend_requires_all_methods():
+    class GetOnlyBackend(ResponseCacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyBackend()
@@ -0,0 +1,111 @@
+import anyio
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+@pytest.mark.anyio
+async def test_do_shares_result():
+    flight = SingleFlight()
+    release = anyio.Event()
+    calls = []
+    results = []
+
+    async def fetch():
+        calls.append(1)
+        await release.wait()
+        return 'image'
+
+    async def waiter():
+        results.append(await flight.do('key', fetch))
+
+    async with anyio.create_task_group() as task_group:
+        for _ in range(3):
+            task_group.start_soon(waiter)
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('image', False), ('image', True), ('image', True)]
+
+@pytest.mark.anyio
+async def test_do_propagates_error():
+    flight = SingleFlight()
+    release = anyio.Event()
+    errors = []
+
+    async def fetch():
+        await release.wait()
+        raise ValueError('error')
+
+    async def waiter():
+        try:
+            await flight.do('key', fetch)
+        except ValueError as exc:
+            errors.append(exc)
+
+    async with anyio.create_task_group() as task_group:
+        for _ in range(2):
+            task_group.start_soon(waiter)
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    assert len(errors) == 2
+
+@pytest.mark.anyio
+async def test_cancelled_leader_does_not_cancel_fetch():
+    flight = SingleFlight()
+    release = anyio.Event()
+    results = []
+
+    async def fetch():
+        await release.wait()
+        return 'image'
+
+    async def leader(scope):
+        with scope:
+            results.append(await flight.do('key', fetch))
+
+    async def follower():
+        results.append(await flight.do('key', fetch))
+
+    leader_scope = anyio.CancelScope()
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(leader, leader_scope)
+        await anyio.wait_all_tasks_blocked()
+        task_group.start_soon(follower)
+        await anyio.wait_all_tasks_blocked()
+        leader_scope.cancel()
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    assert ('image', True) in results
+
+@pytest.mark.anyio
+async def test_cancelled_follower_does_not_cancel_fetch():
+    flight = SingleFlight()
+    release = anyio.Event()
+    results = []
+
+    async def fetch():
+        await release.wait()
+        return 'image'
+
+    async def leader():
+        results.append(await flight.do('key', fetch))
+
+    async def follower(scope):
+        with scope:
+            results.append(await flight.do('key', fetch))
+
+    follower_scope = anyio.CancelScope()
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(leader)
+        await anyio.wait_all_tasks_blocked()
+        task_group.start_soon(follower, follower_scope)
+        await anyio.wait_all_tasks_blocked()
+        follower_scope.cancel()
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    assert results == [('image', False)]
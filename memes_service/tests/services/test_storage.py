@@ -1,9 +1,12 @@
+import io
+
 import pytest
 from pytest_mock import MockerFixture
 from httpx import AsyncClient
 from fastapi import HTTPException
 
 from services.storage import get_storage_service, StorageService
+from core.settings import settings
 
 
 service: StorageService = get_storage_service()
@@ -51,6 +54,57 @@ async def test_get_image_raise_500(mocker: MockerFixture):
 
     assert exc.value.status_code == 500
 
+@pytest.mark.anyio
+async def test_stream_image(mocker: MockerFixture):
+    mock_response = mocker.AsyncMock()
+    mock_response.status_code = 200
+    send = mocker.patch.object(AsyncClient, 'send', return_value=mock_response)
+
+    result = await service.stream_image('name')
+
+    assert result is mock_response
+    assert send.call_args.kwargs['stream'] is True
+    mock_response.aclose.assert_not_called()
+
+@pytest.mark.anyio
+async def test_stream_image_raise_404(mocker: MockerFixture):
+    mock_response = mocker.AsyncMock()
+    mock_response.status_code = 404
+    mocker.patch.object(AsyncClient, 'send', return_value=mock_response)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.stream_image('name')
+
+    assert exc.value.status_code == 404
+    mock_response.aclose.assert_called_once()
+
+@pytest.mark.anyio
+async def test_get_image_url_is_cached(mocker: MockerFixture):
+    mock_response = mocker.Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'url': 'url', 'expires_in': 900}
+    get = mocker.patch.object(AsyncClient, 'get', return_value=mock_response)
+
+    storage = StorageService(settings)
+    first = await storage.get_image_url('name')
+    second = await storage.get_image_url('name')
+
+    assert first == second == 'url'
+    get.assert_called_once()
+
+@pytest.mark.anyio
+async def test_get_image_url_refreshes_before_expiry(mocker: MockerFixture):
+    mock_response = mocker.Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'url': 'url', 'expires_in': 10}
+    get = mocker.patch.object(AsyncClient, 'get', return_value=mock_response)
+
+    storage = StorageService(settings)
+    await storage.get_image_url('name')
+    await storage.get_image_url('name')
+
+    assert get.call_count == 2
+
 @pytest.mark.anyio
 async def test_put_image(mocker: MockerFixture):
     data = {'image_url': 'some url', 'image_name': 'some name'}
@@ -100,4 +154,59 @@ async def test_remove_image_raise_500(mocker: MockerFixture):
 
     with pytest.raises(HTTPException) as exc:
         await service.remove_file(file_name)
-    assert exc.value.status_code == 500
\ No newline at end of file
+    assert exc.value.status_code == 500
+
+@pytest.mark.anyio
+async def test_remove_files(mocker: MockerFixture):
+    mock_response = mocker.Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'results': [
+        {'file_name': 'first', 'deleted': True, 'error': None},
+        {'file_name': 'second', 'deleted': False, 'error': 'Access Denied'}
+    ]}
+    post = mocker.patch.object(AsyncClient, 'post', return_value=mock_response)
+
+    result = await service.remove_files(['first', 'second'])
+
+    assert result == {'first': None, 'second': 'Access Denied'}
+    assert post.call_args.kwargs['json'] == {'file_names': ['first', 'second']}
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('status_code, exists', [(200, True), (404, False)])
+async def test_image_exists(mocker: MockerFixture, status_code: int, exists: bool):
+    mock_response = mocker.Mock()
+    mock_response.status_code = status_code
+    mocker.patch.object(AsyncClient, 'head', return_value=mock_response)
+
+    assert await service.image_exists('name') is exists
+
+@pytest.mark.anyio
+async def test_client_is_shared():
+    storage = StorageService(settings)
+    client = storage.open()
+
+    assert storage.client is client
+    await storage.close()
+    assert client.is_closed
+    assert storage.client is not client
+    await storage.close()
+
+@pytest.mark.anyio
+async def test_client_http2():
+    storage = StorageService(settings.model_copy(update={'STORAGE_HTTP2': True}))
+
+    assert not storage.open().is_closed
+    await storage.close()
+
+@pytest.mark.anyio
+async def test_put_image_streams_file(mocker: MockerFixture):
+    mock_response = mocker.Mock()
+    mock_response.json.return_value = {'image_url': 'some url', 'image_name': 'some name'}
+    mock_response.status_code = 200
+    put = mocker.patch.object(AsyncClient, 'put', return_value=mock_response)
+
+    image = io.BytesIO(b'image')
+    result = await service.put_image('name', image)
+
+    assert result == 'some name'
+    assert put.call_args.kwargs['files'] == {'file': ('name', image)}
@@ -0,0 +1,36 @@
+import uuid
+
+import pytest
+from pytest_mock import MockerFixture
+
+from db.repositories.meme import MemeRepository
+from services.storage import StorageService
+from services.variants import generate_variants
+from core.settings import settings
+
+
+@pytest.mark.anyio
+async def test_generate_variants(mocker: MockerFixture):
+    meme_id = uuid.uuid4()
+    mocker.patch.object(settings, 'MEME_VARIANT_WIDTHS', [320, 640])
+    mocker.patch.object(settings, 'MEME_VARIANT_FORMATS', ['webp'])
+    create_variant = mocker.patch.object(StorageService, 'create_variant', return_value='key')
+    set_variants = mocker.patch.object(MemeRepository, 'set_variants', return_value=True)
+
+    await generate_variants(str(meme_id), 'image_name')
+
+    assert create_variant.call_count == 2
+    set_variants.assert_called_once_with(meme_id, 'image_name', {
+        'w320.webp': f'{settings.SERVICE_IMAGE_ROUTE}image_name?w=320&fmt=webp',
+        'w640.webp': f'{settings.SERVICE_IMAGE_ROUTE}image_name?w=640&fmt=webp'
+    })
+
+@pytest.mark.anyio
+async def test_generate_variants_fails_without_recording(mocker: MockerFixture):
+    mocker.patch.object(StorageService, 'create_variant', side_effect=Exception('error'))
+    set_variants = mocker.patch.object(MemeRepository, 'set_variants')
+
+    with pytest.raises(Exception):
+        await generate_variants(str(uuid.uuid4()), 'image_name')
+
+    set_variants.assert_not_called()
@@ -1,10 +1,18 @@
-from typing import Annotated
+import secrets
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, Any
 
 import fastapi
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
 from services.minio import get_minio_service, MinIOService
-from schemas.minio import PutImageResponse
+from schemas.minio import (
+    PutImageResponse,
+    PresignedUrlResponse,
+    BatchDeleteRequest,
+    BatchDeleteResult,
+    BatchDeleteResponse
+)
 from core.settings import settings
 
 
@@ -13,30 +21,123 @@ router = fastapi.APIRouter(tags=['storage'])
 security= HTTPBasic()
 
 async def get_minio_by_user(credentials: Annotated[HTTPBasicCredentials, fastapi.Depends(security)]) -> MinIOService:
-    access_key_id = credentials.username
-    secret_access_key = credentials.password
-    minio = get_minio_service(access_key_id ,secret_access_key)
-    return minio
+    valid_user = secrets.compare_digest(credentials.username.encode(), settings.MINIO_ACCESS_KEY.encode())
+    valid_password = secrets.compare_digest(credentials.password.encode(), settings.MINIO_SECRET_KEY.encode())
+    if not (valid_user and valid_password):
+        raise fastapi.HTTPException(status_code=403, detail='Неправильные авторизационные данные')
+    return get_minio_service()
+
+def get_object_headers(response: dict[str, Any]) -> dict[str, str]:
+    headers = {'Accept-Ranges': 'bytes', 'Content-Length': str(response['ContentLength'])}
+    if response.get('ETag'):
+        headers['ETag'] = response['ETag']
+    if response.get('LastModified'):
+        headers['Last-Modified'] = format_datetime(response['LastModified'], usegmt=True)
+    if response.get('ContentRange'):
+        headers['Content-Range'] = response['ContentRange']
+    return headers
+
+def get_variant(
+    w: Annotated[int | None, fastapi.Query(description='Ширина миниатюры')]=None,
+    fmt: Annotated[str | None, fastapi.Query(description='Формат миниатюры')]=None
+) -> tuple[int | None, str] | None:
+    if w is None and fmt is None:
+        return None
+    if w is not None and w not in settings.IMAGE_VARIANT_WIDTHS:
+        raise fastapi.HTTPException(status_code=400, detail='Недопустимая ширина изображения')
+    if fmt is not None and fmt not in settings.IMAGE_VARIANT_FORMATS:
+        raise fastapi.HTTPException(status_code=400, detail='Недопустимый формат изображения')
+    return w, fmt or settings.IMAGE_VARIANT_DEFAULT_FORMAT
 
 @router.get('/images/{file_name}')
 async def get_image(
     file_name: Annotated[str, fastapi.Path()],
+    variant: tuple[int | None, str] | None=fastapi.Depends(get_variant),
+    byte_range: Annotated[str | None, fastapi.Header(alias='Range')]=None,
+    if_none_match: Annotated[str | None, fastapi.Header()]=None,
+    if_modified_since: Annotated[str | None, fastapi.Header()]=None,
     minio: MinIOService=fastapi.Depends(get_minio_by_user)
 ) -> fastapi.Response:
-    file = await minio.get_file(file_name)
-    return fastapi.Response(content=file, media_type='image/*')
+    modified_since = None
+    if if_modified_since and not if_none_match:
+        try:
+            modified_since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            pass
+    media_type = 'image/*'
+    if variant is not None:
+        width, fmt = variant
+        media_type = f'image/{fmt}'
+        response = await minio.get_variant(file_name, width, fmt)
+    elif byte_range or if_none_match or modified_since:
+        response = await minio.get_file_stream(
+            file_name,
+            byte_range=byte_range,
+            if_none_match=if_none_match,
+            if_modified_since=modified_since
+        )
+    else:
+        response = await minio.get_file_shared(file_name)
+    if 'Content' in response:
+        return fastapi.Response(
+            content=response['Content'],
+            media_type=media_type,
+            headers=get_object_headers(response)
+        )
+    return fastapi.responses.StreamingResponse(
+        minio.iter_body(response['Body']),
+        status_code=206 if response.get('ContentRange') else 200,
+        media_type=media_type,
+        headers=get_object_headers(response)
+    )
+
+
+@router.head('/images/{file_name}')
+async def head_image(
+    file_name: Annotated[str, fastapi.Path()],
+    minio: MinIOService=fastapi.Depends(get_minio_by_user)
+) -> fastapi.Response:
+    if not await minio.file_exists(file_name):
+        raise fastapi.HTTPException(status_code=404, detail='Изображение не найдено')
+    return fastapi.Response(status_code=200)
+
+
+@router.get('/images/{file_name}/url')
+async def get_image_url(
+    file_name: Annotated[str, fastapi.Path()],
+    variant: tuple[int | None, str] | None=fastapi.Depends(get_variant),
+    minio: MinIOService=fastapi.Depends(get_minio_by_user)
+) -> PresignedUrlResponse:
+    if variant is not None:
+        file_name = await minio.ensure_variant(file_name, *variant)
+    return await minio.get_presigned_url(file_name)
+
+
+@router.put('/images/{file_name}/variants')
+async def create_image_variant(
+    file_name: Annotated[str, fastapi.Path()],
+    variant: tuple[int | None, str] | None=fastapi.Depends(get_variant),
+    minio: MinIOService=fastapi.Depends(get_minio_by_user)
+) -> PutImageResponse:
+    if variant is None:
+        raise fastapi.HTTPException(status_code=400, detail='Не указаны параметры миниатюры')
+    key = await minio.ensure_variant(file_name, *variant)
+    return PutImageResponse(image_name=key, image_url=minio.get_object_url(key))
 
 
 @router.put('/images')
 async def update_image(
     file: Annotated[fastapi.UploadFile, fastapi.File(description='Файл изображения')],
+    content_addressed: Annotated[bool, fastapi.Query(description='Сохранить изображение под хэшем содержимого')]=False,
     minio: MinIOService=fastapi.Depends(get_minio_by_user)
 ) -> PutImageResponse:
     try:
-        image = await file.read()
+        if content_addressed:
+            response = await minio.upload_content(file)
+        else:
+            response = await minio.upload_fileobj(file.filename, file)
     finally:
         await file.close()
-    response = await minio.upload_file(file.filename, image)
 
     return response
 
@@ -46,4 +147,18 @@ async def delete_image(
     minio: MinIOService=fastapi.Depends(get_minio_by_user)
 ) -> fastapi.Response:
     await minio.remove_file(image_name)
-    return fastapi.Response(status_code=200)
\ No newline at end of file
+    return fastapi.Response(status_code=200)
+
+@router.post('/images:batchDelete')
+async def batch_delete_images(
+    request: BatchDeleteRequest,
+    minio: MinIOService=fastapi.Depends(get_minio_by_user)
+) -> BatchDeleteResponse:
+    file_names = list(dict.fromkeys(request.file_names))
+    if len(file_names) > settings.MINIO_DELETE_MAX_ITEMS:
+        raise fastapi.HTTPException(status_code=400, detail='Превышено количество изображений в запросе')
+    errors = await minio.remove_files(file_names)
+    return BatchDeleteResponse(results=[
+        BatchDeleteResult(file_name=file_name, deleted=errors[file_name] is None, error=errors[file_name])
+        for file_name in file_names
+    ])
@@ -15,6 +15,27 @@ class Settings(BaseSettings):
     MINIO_BUCKET_NAME: str
     MINIO_EDNPOINT: str
     MINIO_HOST: str
+    MINIO_PUBLIC_ENDPOINT: str | None = None
+    MINIO_PRESIGN_EXPIRES: int = 900
+    MINIO_PRESIGN_REFRESH_MARGIN: int = 60
+    MINIO_PRESIGN_CACHE_SIZE: int = 10000
+    MINIO_MAX_POOL_CONNECTIONS: int = 50
+    MINIO_CONNECT_TIMEOUT: float = 3
+    MINIO_READ_TIMEOUT: float = 30
+    MINIO_MAX_ATTEMPTS: int = 3
+    MINIO_KEEPALIVE_TIMEOUT: float = 30
+    MINIO_CHUNK_SIZE: int = 64 * 1024
+    MINIO_COALESCE_MAX_BYTES: int = 4 * 1024 * 1024
+    MINIO_DELETE_BATCH_SIZE: int = 1000
+    MINIO_DELETE_CONCURRENCY: int = 4
+    MINIO_DELETE_MAX_ITEMS: int = 10000
+    IMAGE_VARIANT_WIDTHS: list[int] = [160, 320, 640, 1280]
+    IMAGE_VARIANT_FORMATS: list[str] = ['webp', 'jpeg', 'png']
+    IMAGE_VARIANT_DEFAULT_FORMAT: str = 'webp'
+    IMAGE_VARIANT_QUALITY: int = 80
+    MINIO_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    MINIO_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    MINIO_MULTIPART_CONCURRENCY: int = 4
 
     class Config:
         env_file='.env'
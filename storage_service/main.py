@@ -1,11 +1,20 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.v1.storage import router as storage_router
+from services.minio import close_minio_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_minio_service()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(
     storage_router,
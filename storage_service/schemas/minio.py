@@ -7,4 +7,40 @@ class PutImageResponse(BaseModel):
     )
     image_name: str = Field(
         description='Название изображения(является идентификатором в хранилище)'
-    )
\ No newline at end of file
+    )
+
+
+class PresignedUrlResponse(BaseModel):
+    url: str = Field(
+        description='Временная ссылка на изображение'
+    )
+    expires_in: int = Field(
+        description='Время жизни ссылки в секундах'
+    )
+
+
+
+class BatchDeleteRequest(BaseModel):
+    file_names: list[str] = Field(
+        description='Названия удаляемых изображений',
+        min_length=1
+    )
+
+
+class BatchDeleteResult(BaseModel):
+    file_name: str = Field(
+        description='Название изображения'
+    )
+    deleted: bool = Field(
+        description='Изображение удалено'
+    )
+    error: str | None = Field(
+        description='Причина ошибки',
+        default=None
+    )
+
+
+class BatchDeleteResponse(BaseModel):
+    results: list[BatchDeleteResult] = Field(
+        description='Результаты по каждому изображению в порядке запроса'
+    )
@@ -0,0 +1,22 @@
+import io
+
+from PIL import Image, ImageOps
+
+
+def variant_name(file_name: str, width: int | None, fmt: str) -> str:
+    return f'variants/{file_name}/w{width or "orig"}.{fmt}'
+
+
+def resize_image(content: bytes, width: int | None, fmt: str, quality: int) -> bytes:
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        if width and image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        if fmt == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format=fmt.upper(), quality=quality)
+        return output.getvalue()
@@ -1,12 +1,24 @@
-from contextlib import asynccontextmanager
-from functools import lru_cache
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, AsyncExitStack
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Any, AsyncIterator, BinaryIO
 
-from fastapi import HTTPException
+import anyio
+import anyio.to_process
+import anyio.to_thread
+from fastapi import HTTPException, UploadFile
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
 from botocore.exceptions import ClientError
+from PIL import UnidentifiedImageError
 
 from core.settings import settings, Settings
-from schemas.minio import PutImageResponse
+from schemas.minio import PutImageResponse, PresignedUrlResponse
+from services.singleflight import SingleFlight
+from services.images import resize_image, variant_name
 
 
 class MinIOService:
@@ -16,19 +28,83 @@ class MinIOService:
             'aws_secret_access_key': secret_access_key,
             'endpoint_url': settings.MINIO_EDNPOINT
         }
+        self.client_config = AioConfig(
+            max_pool_connections=settings.MINIO_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.MINIO_CONNECT_TIMEOUT,
+            read_timeout=settings.MINIO_READ_TIMEOUT,
+            retries={'max_attempts': settings.MINIO_MAX_ATTEMPTS, 'mode': 'standard'},
+            connector_args={'keepalive_timeout': settings.MINIO_KEEPALIVE_TIMEOUT}
+        )
         self.bucket_name = settings.MINIO_BUCKET_NAME
+        self.chunk_size = settings.MINIO_CHUNK_SIZE
+        self.coalesce_max_bytes = settings.MINIO_COALESCE_MAX_BYTES
+        self.delete_batch_size = settings.MINIO_DELETE_BATCH_SIZE
+        self.delete_concurrency = settings.MINIO_DELETE_CONCURRENCY
+        self.variant_widths = settings.IMAGE_VARIANT_WIDTHS
+        self.variant_formats = settings.IMAGE_VARIANT_FORMATS
+        self.variant_quality = settings.IMAGE_VARIANT_QUALITY
+        self.multipart_threshold = settings.MINIO_MULTIPART_THRESHOLD
+        self.part_size = settings.MINIO_MULTIPART_PART_SIZE
+        self.multipart_concurrency = settings.MINIO_MULTIPART_CONCURRENCY
+        self.presign_endpoint = settings.MINIO_PUBLIC_ENDPOINT or settings.MINIO_EDNPOINT
+        self.presign_expires = settings.MINIO_PRESIGN_EXPIRES
+        self.presign_refresh_margin = settings.MINIO_PRESIGN_REFRESH_MARGIN
+        self.presign_cache_size = settings.MINIO_PRESIGN_CACHE_SIZE
         self.session = get_session()
+        self._client = None
+        self._presign_client = None
+        self._presigned_urls: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._exit_stack: AsyncExitStack | None = None
+        self._lock = anyio.Lock()
+        self._flight = SingleFlight()
+
+    async def open(self):
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    exit_stack = AsyncExitStack()
+                    client = await exit_stack.enter_async_context(
+                        self.session.create_client('s3', config=self.client_config, **self.config)
+                    )
+                    presign_client = client
+                    if self.presign_endpoint != self.config['endpoint_url']:
+                        presign_client = await exit_stack.enter_async_context(
+                            self.session.create_client(
+                                's3',
+                                config=self.client_config,
+                                **{**self.config, 'endpoint_url': self.presign_endpoint}
+                            )
+                        )
+                    self._exit_stack = exit_stack
+                    self._presign_client = presign_client
+                    self._client = client
+        return self._client
+
+    async def close(self) -> None:
+        if self._exit_stack is not None:
+            exit_stack, self._exit_stack, self._client, self._presign_client = self._exit_stack, None, None, None
+            await exit_stack.aclose()
 
     @asynccontextmanager
     async def get_client(self):
         try:
-            async with  self.session.create_client('s3', **self.config) as client:
-                yield client
+            yield await self.open()
         except ClientError as exc:
             if exc.response['ResponseMetadata']['HTTPStatusCode'] == 404:
                 raise HTTPException(status_code=404, detail='Изображение не найдено')
             if exc.response['ResponseMetadata']['HTTPStatusCode'] == 403:
                 raise HTTPException(status_code=403, detail='Неправильные авторизационные данные')
+            if exc.response['ResponseMetadata']['HTTPStatusCode'] == 304:
+                headers = exc.response['ResponseMetadata'].get('HTTPHeaders', {})
+                raise HTTPException(
+                    status_code=304,
+                    headers={name: headers[name] for name in ('etag', 'last-modified') if name in headers}
+                )
+            if exc.response['ResponseMetadata']['HTTPStatusCode'] == 412:
+                raise HTTPException(status_code=412, detail='Условие запроса не выполнено')
+            if exc.response['ResponseMetadata']['HTTPStatusCode'] == 416:
+                raise HTTPException(status_code=416, detail='Запрошенный диапазон недоступен')
+            raise
 
     async def get_file(self, file_name: str) -> bytes:
         async with self.get_client() as client:
@@ -37,6 +113,105 @@ class MinIOService:
                 file = await stream.read()
             return file
 
+    async def get_file_stream(
+        self,
+        file_name: str,
+        byte_range: str | None=None,
+        if_none_match: str | None=None,
+        if_modified_since: datetime | None=None
+    ) -> dict[str, Any]:
+        params = {}
+        if byte_range:
+            params['Range'] = byte_range
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        if if_modified_since:
+            params['IfModifiedSince'] = if_modified_since
+        async with self.get_client() as client:
+            return await client.get_object(Bucket=self.bucket_name, Key=file_name, **params)
+
+    async def get_file_shared(self, file_name: str) -> dict[str, Any]:
+        response, shared = await self._flight.do(file_name, partial(self._load_file, file_name))
+        if shared and 'Content' not in response:
+            return await self.get_file_stream(file_name)
+        return response
+
+    async def _load_file(self, file_name: str) -> dict[str, Any]:
+        response = await self.get_file_stream(file_name)
+        if response['ContentLength'] > self.coalesce_max_bytes:
+            return response
+        async with response['Body'] as stream:
+            content = await stream.read()
+        return {**response, 'Body': None, 'Content': content}
+
+    async def get_variant(self, file_name: str, width: int | None, fmt: str) -> dict[str, Any]:
+        key = variant_name(file_name, width, fmt)
+        try:
+            return await self.get_file_shared(key)
+        except HTTPException as exc:
+            if exc.status_code != 404:
+                raise
+        response, _ = await self._flight.do(('variant', key), partial(self._create_variant, file_name, key, width, fmt))
+        return response
+
+    async def ensure_variant(self, file_name: str, width: int | None, fmt: str) -> str:
+        key = variant_name(file_name, width, fmt)
+        try:
+            async with self.get_client() as client:
+                await client.head_object(Bucket=self.bucket_name, Key=key)
+        except HTTPException as exc:
+            if exc.status_code != 404:
+                raise
+            await self._flight.do(('variant', key), partial(self._create_variant, file_name, key, width, fmt))
+        return key
+
+    async def _create_variant(self, file_name: str, key: str, width: int | None, fmt: str) -> dict[str, Any]:
+        original = await self.get_file(file_name)
+        try:
+            content = await anyio.to_process.run_sync(resize_image, original, width, fmt, self.variant_quality)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=415, detail='Файл не является изображением')
+        await self.upload_file(key, content)
+        return {'Body': None, 'Content': content, 'ContentLength': len(content)}
+
+    def variant_keys(self, file_name: str) -> list[str]:
+        return [
+            variant_name(file_name, width, fmt)
+            for width in [None, *self.variant_widths]
+            for fmt in self.variant_formats
+        ]
+
+    async def remove_variants(self, file_name: str) -> None:
+        keys = [{'Key': key} for key in self.variant_keys(file_name)]
+        async with self.get_client() as client:
+            await client.delete_objects(Bucket=self.bucket_name, Delete={'Objects': keys, 'Quiet': True})
+
+    async def iter_body(self, body: Any) -> AsyncIterator[bytes]:
+        async with body as stream:
+            async for chunk in stream.iter_chunks(self.chunk_size):
+                yield chunk
+
+    def get_object_url(self, file_name: str) -> str:
+        return f'{self.config["endpoint_url"]}/{self.bucket_name}/{file_name}'
+
+    async def get_presigned_url(self, file_name: str) -> PresignedUrlResponse:
+        now = time.monotonic()
+        cached = self._presigned_urls.get(file_name)
+        if cached is not None and cached[1] - now > self.presign_refresh_margin:
+            self._presigned_urls.move_to_end(file_name)
+            return PresignedUrlResponse(url=cached[0], expires_in=int(cached[1] - now))
+
+        async with self.get_client():
+            url = await self._presign_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket_name, 'Key': file_name},
+                ExpiresIn=self.presign_expires
+            )
+        self._presigned_urls[file_name] = (url, now + self.presign_expires)
+        while len(self._presigned_urls) > self.presign_cache_size:
+            self._presigned_urls.popitem(last=False)
+        return PresignedUrlResponse(url=url, expires_in=self.presign_expires)
+
     async def upload_file(self, file_name: str, file: bytes) -> PutImageResponse:
         async with self.get_client() as client:
             await client.put_object(
@@ -44,20 +219,140 @@ class MinIOService:
                 Key=file_name,
                 Body=file
             )
-        image_url = f'{self.config["endpoint_url"]}/{self.bucket_name}/{file_name}'
+        image_url = self.get_object_url(file_name)
 
         return PutImageResponse(image_name=file_name, image_url=image_url)
 
-    async def remove_file(self, file_name: str) -> str:
+    async def file_exists(self, file_name: str) -> bool:
+        try:
+            async with self.get_client() as client:
+                await client.head_object(Bucket=self.bucket_name, Key=file_name)
+        except HTTPException as exc:
+            if exc.status_code != 404:
+                raise
+            return False
+        return True
+
+    async def upload_content(self, file: UploadFile) -> PutImageResponse:
+        file_name = await anyio.to_thread.run_sync(hash_file, file.file, self.chunk_size)
+        if not await self.file_exists(file_name):
+            await file.seek(0)
+            return await self.upload_fileobj(file_name, file)
+        return PutImageResponse(image_name=file_name, image_url=self.get_object_url(file_name))
+
+    async def upload_fileobj(self, file_name: str, file: UploadFile) -> PutImageResponse:
+        if file.size is not None and file.size <= self.multipart_threshold:
+            response = await self.upload_file(file_name, await file.read())
+            await self.remove_variants(file_name)
+            return response
+
         async with self.get_client() as client:
-            await client.delete_object(
-                Bucket=self.bucket_name,
-                Key=file_name
-            )
+            upload = await client.create_multipart_upload(Bucket=self.bucket_name, Key=file_name)
+            upload_id = upload['UploadId']
+            try:
+                parts = await self._upload_parts(client, file_name, upload_id, file)
+                await client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=file_name,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            except BaseException:
+                with anyio.CancelScope(shield=True):
+                    await client.abort_multipart_upload(Bucket=self.bucket_name, Key=file_name, UploadId=upload_id)
+                raise
+        await self.remove_variants(file_name)
+        image_url = self.get_object_url(file_name)
+
+        return PutImageResponse(image_name=file_name, image_url=image_url)
+
+    async def _upload_parts(self, client: Any, file_name: str, upload_id: str, file: UploadFile) -> list[dict[str, Any]]:
+        etags: dict[int, str] = {}
+        semaphore = anyio.Semaphore(self.multipart_concurrency)
+
+        async def upload_part(part_number: int, chunk: bytes) -> None:
+            try:
+                response = await client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=file_name,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=chunk
+                )
+                etags[part_number] = response['ETag']
+            finally:
+                semaphore.release()
+
+        try:
+            async with anyio.create_task_group() as task_group:
+                part_number = 1
+                while True:
+                    await semaphore.acquire()
+                    chunk = await file.read(self.part_size)
+                    if not chunk and part_number > 1:
+                        semaphore.release()
+                        break
+                    task_group.start_soon(upload_part, part_number, chunk)
+                    if not chunk:
+                        break
+                    part_number += 1
+        except* ClientError as group:
+            raise group.exceptions[0]
+        return [{'ETag': etags[number], 'PartNumber': number} for number in sorted(etags)]
+
+    async def remove_file(self, file_name: str) -> str:
+        errors = await self.remove_files([file_name])
+        if errors[file_name] is not None:
+            raise HTTPException(status_code=500, detail=errors[file_name])
 
         return file_name
 
+    async def remove_files(self, file_names: list[str]) -> dict[str, str | None]:
+        owners = {key: file_name for file_name in file_names for key in [file_name, *self.variant_keys(file_name)]}
+        keys = list(owners)
+        errors: dict[str, str] = {}
+        semaphore = anyio.Semaphore(self.delete_concurrency)
+
+        async def delete_chunk(chunk: list[str]) -> None:
+            try:
+                async with semaphore:
+                    async with self.get_client() as client:
+                        response = await client.delete_objects(
+                            Bucket=self.bucket_name,
+                            Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+                        )
+            except HTTPException as exc:
+                response = {'Errors': [{'Key': key, 'Message': exc.detail} for key in chunk]}
+            except ClientError as exc:
+                message = exc.response.get('Error', {}).get('Message') or 'Неполадки в работе'
+                response = {'Errors': [{'Key': key, 'Message': message} for key in chunk]}
+            for error in response.get('Errors', []):
+                errors.setdefault(owners[error['Key']], error.get('Message') or error.get('Code'))
+
+        async with anyio.create_task_group() as task_group:
+            for start in range(0, len(keys), self.delete_batch_size):
+                task_group.start_soon(delete_chunk, keys[start:start + self.delete_batch_size])
+        for file_name in file_names:
+            if file_name not in errors:
+                self._presigned_urls.pop(file_name, None)
+        return {file_name: errors.get(file_name) for file_name in file_names}
+
+
+def hash_file(file: BinaryIO, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    while chunk := file.read(chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
 
 @lru_cache
-def get_minio_service(access_key_id:str, secret_access_key: str):
-    return MinIOService(settings=settings, access_key_id=access_key_id, secret_access_key=secret_access_key)
\ No newline at end of file
+def get_minio_service() -> MinIOService:
+    return MinIOService(
+        settings=settings,
+        access_key_id=settings.MINIO_ACCESS_KEY,
+        secret_access_key=settings.MINIO_SECRET_KEY
+    )
+
+
+async def close_minio_service() -> None:
+    await get_minio_service().close()
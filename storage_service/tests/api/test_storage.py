@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 import pytest
 from pytest_mock import MockerFixture
 from httpx import AsyncClient, ASGITransport, BasicAuth
@@ -7,21 +9,39 @@ from botocore.exceptions import ClientError
 
 from main import app
 from services.minio import MinIOService
-from schemas.minio import PutImageResponse
+from schemas.minio import PutImageResponse, PresignedUrlResponse
+from core.settings import settings
 
 
 @pytest.mark.anyio
 async def test_get_image_200(mocker: MockerFixture):
-    auth = BasicAuth(username='user', password='pass')
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    async def iter_body(self, body):
+        yield b'ima'
+        yield b'ge'
 
-    mocker.patch.object(MinIOService, 'get_file', return_value=bytes())
+    mocker.patch.object(MinIOService, 'get_file_shared', return_value={'Body': None, 'ContentLength': 5})
+    mocker.patch.object(MinIOService, 'iter_body', new=iter_body)
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
         response = await client.get(f"/images/{'file_name'}")
     assert response.status_code == 200
+    assert response.content == b'image'
+    assert response.headers['content-length'] == '5'
+
+@pytest.mark.anyio
+async def test_get_image_200_buffered(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    mocker.patch.object(MinIOService, 'get_file_shared', return_value={'Body': None, 'Content': b'image', 'ContentLength': 5})
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}")
+    assert response.status_code == 200
+    assert response.content == b'image'
 
 @pytest.mark.anyio
 async def test_get_image_404(mocker: MockerFixture):
-    auth = BasicAuth(username='user', password='pass')
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
     exc = {'ResponseMetadata': {'HTTPStatusCode': 404}}
 
     mocker.patch.object(AioSession, 'create_client', side_effect=ClientError(exc, ''))
@@ -30,34 +50,147 @@ async def test_get_image_404(mocker: MockerFixture):
         response = await client.get(f"/images/{'file_name'}")
     assert response.status_code == 404
 
+@pytest.mark.anyio
+async def test_get_image_206(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    async def iter_body(self, body):
+        yield b'ag'
+
+    object_response = {
+        'Body': None,
+        'ContentLength': 2,
+        'ContentRange': 'bytes 2-3/5',
+        'ETag': '"etag"',
+        'LastModified': datetime(2024, 7, 16, 13, 56, 49, tzinfo=timezone.utc)
+    }
+    get_file_stream = mocker.patch.object(MinIOService, 'get_file_stream', return_value=object_response)
+    mocker.patch.object(MinIOService, 'iter_body', new=iter_body)
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}", headers={'Range': 'bytes=2-3'})
+    assert response.status_code == 206
+    assert response.headers['content-range'] == 'bytes 2-3/5'
+    assert response.headers['etag'] == '"etag"'
+    assert response.headers['last-modified'] == 'Tue, 16 Jul 2024 13:56:49 GMT'
+    assert get_file_stream.call_args.kwargs['byte_range'] == 'bytes=2-3'
+
+@pytest.mark.anyio
+async def test_get_image_304(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+    exc = {'ResponseMetadata': {'HTTPStatusCode': 304, 'HTTPHeaders': {'etag': '"etag"'}}}
+
+    mocker.patch.object(AioSession, 'create_client', side_effect=ClientError(exc, ''))
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}", headers={'If-None-Match': '"etag"'})
+    assert response.status_code == 304
+    assert response.headers['etag'] == '"etag"'
+
+@pytest.mark.anyio
+async def test_get_image_url_200(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    presigned = PresignedUrlResponse(url='url', expires_in=900)
+    mocker.patch.object(MinIOService, 'get_presigned_url', return_value=presigned)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}/url")
+    assert response.status_code == 200
+    assert response.json() == {'url': 'url', 'expires_in': 900}
+
+@pytest.mark.anyio
+async def test_get_image_variant_200(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    get_variant = mocker.patch.object(MinIOService, 'get_variant', return_value={'Content': b'image', 'ContentLength': 5})
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}", params={'w': 320})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/webp'
+    assert response.content == b'image'
+    get_variant.assert_called_once_with('file_name', 320, 'webp')
+
+@pytest.mark.anyio
+async def test_get_image_variant_streamed(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    async def iter_body(self, body):
+        yield b'ima'
+        yield b'ge'
+
+    mocker.patch.object(MinIOService, 'get_variant', return_value={'Body': object(), 'ContentLength': 5})
+    mocker.patch.object(MinIOService, 'iter_body', new=iter_body)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}", params={'fmt': 'png'})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/png'
+    assert response.content == b'image'
+
+@pytest.mark.anyio
+async def test_get_image_variant_400(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.get(f"/images/{'file_name'}", params={'w': 321})
+    assert response.status_code == 400
+
+@pytest.mark.anyio
+async def test_create_image_variant_200(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    ensure_variant = mocker.patch.object(MinIOService, 'ensure_variant', return_value='variants/file_name/w320.webp')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.put(f"/images/{'file_name'}/variants", params={'w': 320, 'fmt': 'webp'})
+    assert response.status_code == 200
+    assert response.json()['image_name'] == 'variants/file_name/w320.webp'
+    ensure_variant.assert_called_once_with('file_name', 320, 'webp')
+
 @pytest.mark.anyio
 async def test_put_image_200(mocker: MockerFixture):
-    auth = BasicAuth(username='user', password='pass')
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
 
     put_response = PutImageResponse(image_name='file_name', image_url='image_url')
-    mocker.patch.object(MinIOService, 'upload_file', return_value=put_response)
+    mocker.patch.object(MinIOService, 'upload_fileobj', return_value=put_response)
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
         file = {'file': ('file name', bytes())}
         response = await client.put('/images', files=file)
     assert response.status_code == 200
 
+@pytest.mark.anyio
+async def test_put_image_content_addressed(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    put_response = PutImageResponse(image_name='hash', image_url='image_url')
+    upload_content = mocker.patch.object(MinIOService, 'upload_content', return_value=put_response)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        file = {'file': ('file name', bytes())}
+        response = await client.put('/images', files=file, params={'content_addressed': True})
+    assert response.status_code == 200
+    assert response.json()['image_name'] == 'hash'
+    upload_content.assert_called_once()
+
 @pytest.mark.anyio
 async def test_put_image_403(mocker: MockerFixture):
     auth = BasicAuth(username='incorrect_user', password='incorrect_pass')
     exc = {'ResponseMetadata': {'HTTPStatusCode': 403}}
 
-    mocker.patch.object(AioSession, 'create_client', side_effect=ClientError(exc, ''))
+    create_client = mocker.patch.object(AioSession, 'create_client', side_effect=ClientError(exc, ''))
 
     async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
         file = {'file': ('file name', bytes())}
         response = await client.put('/images', files=file)
     assert response.status_code == 403
+    create_client.assert_not_called()
 
 @pytest.mark.anyio
 async def test_delete_image_200(mocker: MockerFixture):
     file_name = 'file_name'
-    auth = BasicAuth(username='user', password='pass')
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
 
     mocker.patch.object(MinIOService, 'remove_file', return_value=file_name)
 
@@ -66,3 +199,46 @@ async def test_delete_image_200(mocker: MockerFixture):
         response = await client.delete(f'/images/{file_name}')
     assert response.status_code == 200
 
+
+@pytest.mark.anyio
+async def test_batch_delete_images(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+    remove_files = mocker.patch.object(MinIOService, 'remove_files', return_value={'first': None, 'second': 'AccessDenied'})
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.post('/images:batchDelete', json={'file_names': ['first', 'second', 'first']})
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'file_name': 'first', 'deleted': True, 'error': None},
+        {'file_name': 'second', 'deleted': False, 'error': 'AccessDenied'}
+    ]
+    remove_files.assert_called_once_with(['first', 'second'])
+
+@pytest.mark.anyio
+async def test_batch_delete_images_empty():
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.post('/images:batchDelete', json={'file_names': []})
+    assert response.status_code == 422
+
+@pytest.mark.anyio
+async def test_batch_delete_images_too_many(mocker: MockerFixture):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+    mocker.patch.object(settings, 'MINIO_DELETE_MAX_ITEMS', 2)
+    remove_files = mocker.patch.object(MinIOService, 'remove_files')
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.post('/images:batchDelete', json={'file_names': ['first', 'second', 'third']})
+    assert response.status_code == 400
+    remove_files.assert_not_called()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('exists, status_code', [(True, 200), (False, 404)])
+async def test_head_image(mocker: MockerFixture, exists: bool, status_code: int):
+    auth = BasicAuth(username=settings.MINIO_ACCESS_KEY, password=settings.MINIO_SECRET_KEY)
+    mocker.patch.object(MinIOService, 'file_exists', return_value=exists)
+
+    async with AsyncClient(transport=ASGITransport(app=app, client=('localhost', '8000')), base_url="http://localhost:8000/api/v1", auth=auth,) as client:
+        response = await client.head('/images/file_name')
+    assert response.status_code == status_code
@@ -0,0 +1,32 @@
+import io
+
+from PIL import Image
+
+from services.images import resize_image, variant_name
+
+
+def make_image(width: int, height: int, mode: str='RGB') -> bytes:
+    output = io.BytesIO()
+    Image.new(mode, (width, height)).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_variant_name():
+    assert variant_name('file_name', 320, 'webp') == 'variants/file_name/w320.webp'
+    assert variant_name('file_name', None, 'png') == 'variants/file_name/worig.png'
+
+
+def test_resize_image():
+    content = resize_image(make_image(640, 480), 320, 'webp', 80)
+
+    with Image.open(io.BytesIO(content)) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (320, 240)
+
+
+def test_resize_image_does_not_upscale():
+    content = resize_image(make_image(100, 50, 'RGBA'), 320, 'jpeg', 80)
+
+    with Image.open(io.BytesIO(content)) as image:
+        assert image.format == 'JPEG'
+        assert image.size == (100, 50)
@@ -1,12 +1,19 @@
+import io
+
+import anyio
 import pytest
 from pytest_mock import MockerFixture
 from aiobotocore.session import AioSession
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, UploadFile
+from PIL import Image
 
-from services.minio import get_minio_service, MinIOService
+from services.minio import get_minio_service, hash_file, MinIOService
 from schemas.minio import PutImageResponse
+from core.settings import settings
 
 
-service: MinIOService = get_minio_service(access_key_id='key', secret_access_key='key')
+service: MinIOService = get_minio_service()
 
 @pytest.mark.anyio
 async def test_update_image(mocker: MockerFixture):
@@ -26,9 +33,311 @@ async def test_update_image(mocker: MockerFixture):
 async def test_remove_image(mocker: MockerFixture):
     file_name = 'file_name'
 
-    client_mock = mocker.MagicMock()
-    mocker.patch.object(AioSession, 'create_client', return_value=client_mock)
+    client = mocker.AsyncMock()
+    client.delete_objects.return_value = {}
+    mocker.patch.object(MinIOService, 'open', return_value=client)
 
     result = await service.remove_file(file_name)
 
-    assert result == file_name
\ No newline at end of file
+    assert result == file_name
+    keys = client.delete_objects.call_args.kwargs['Delete']['Objects']
+    assert {'Key': file_name} in keys
+
+@pytest.mark.anyio
+async def test_remove_image_error(mocker: MockerFixture):
+    client = mocker.AsyncMock()
+    client.delete_objects.return_value = {'Errors': [{'Key': 'file_name', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]}
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.remove_file('file_name')
+    assert exc.value.status_code == 500
+
+@pytest.mark.anyio
+async def test_client_is_reused(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    create_client = mocker.patch.object(AioSession, 'create_client', return_value=mocker.MagicMock())
+    create_client.return_value.__aenter__.return_value.delete_objects.return_value = {}
+
+    await minio.upload_file('file_name', bytes())
+    await minio.remove_file('file_name')
+    create_client.assert_called_once()
+
+    client_manager = create_client.return_value
+    await minio.close()
+    client_manager.__aexit__.assert_called_once()
+
+@pytest.mark.anyio
+async def test_iter_body(mocker: MockerFixture):
+    async def iter_chunks(chunk_size):
+        yield b'ima'
+        yield b'ge'
+
+    body = mocker.MagicMock()
+    body.__aenter__.return_value.iter_chunks = iter_chunks
+
+    chunks = [chunk async for chunk in service.iter_body(body)]
+
+    assert chunks == [b'ima', b'ge']
+    body.__aexit__.assert_called_once()
+
+@pytest.mark.anyio
+async def test_upload_fileobj_multipart(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.multipart_threshold = 4
+    minio.part_size = 4
+    client = mocker.AsyncMock()
+    client.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    client.upload_part.side_effect = lambda **kwargs: {'ETag': f'etag{kwargs["PartNumber"]}'}
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    file = UploadFile(io.BytesIO(b'0123456789'), filename='file_name')
+    result = await minio.upload_fileobj('file_name', file)
+
+    assert result.image_name == 'file_name'
+    bodies = sorted((call.kwargs['PartNumber'], call.kwargs['Body']) for call in client.upload_part.call_args_list)
+    assert bodies == [(1, b'0123'), (2, b'4567'), (3, b'89')]
+    parts = client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts']
+    assert parts == [{'ETag': f'etag{number}', 'PartNumber': number} for number in (1, 2, 3)]
+    client.abort_multipart_upload.assert_not_called()
+
+@pytest.mark.anyio
+async def test_upload_fileobj_multipart_abort(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.multipart_threshold = 4
+    minio.part_size = 4
+    client = mocker.AsyncMock()
+    client.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    client.upload_part.side_effect = ClientError({'ResponseMetadata': {'HTTPStatusCode': 403}}, '')
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    file = UploadFile(io.BytesIO(b'0123456789'), filename='file_name')
+    with pytest.raises(HTTPException) as exc:
+        await minio.upload_fileobj('file_name', file)
+
+    assert exc.value.status_code == 403
+    client.abort_multipart_upload.assert_called_once()
+    client.complete_multipart_upload.assert_not_called()
+
+@pytest.mark.anyio
+async def test_get_file_shared_coalesces(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    release = anyio.Event()
+    body = mocker.MagicMock()
+    body.__aenter__.return_value.read = mocker.AsyncMock(return_value=b'image')
+
+    async def get_file_stream(file_name):
+        await release.wait()
+        return {'Body': body, 'ContentLength': 5}
+
+    get_file_stream = mocker.patch.object(minio, 'get_file_stream', side_effect=get_file_stream)
+    results = []
+
+    async def waiter():
+        results.append(await minio.get_file_shared('file_name'))
+
+    async with anyio.create_task_group() as task_group:
+        for _ in range(3):
+            task_group.start_soon(waiter)
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    assert get_file_stream.call_count == 1
+    assert [result['Content'] for result in results] == [b'image'] * 3
+
+@pytest.mark.anyio
+async def test_get_file_shared_streams_large_file(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.coalesce_max_bytes = 4
+    mocker.patch.object(minio, 'get_file_stream', return_value={'Body': 'body', 'ContentLength': 5})
+
+    result = await minio.get_file_shared('file_name')
+
+    assert result == {'Body': 'body', 'ContentLength': 5}
+
+@pytest.mark.anyio
+async def test_get_presigned_url_is_cached(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    client = mocker.AsyncMock()
+    client.generate_presigned_url.return_value = 'url'
+    minio._presign_client = client
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    first = await minio.get_presigned_url('file_name')
+    second = await minio.get_presigned_url('file_name')
+
+    assert first.url == second.url == 'url'
+    assert first.expires_in == minio.presign_expires
+    client.generate_presigned_url.assert_called_once()
+
+@pytest.mark.anyio
+async def test_get_presigned_url_refreshes_before_expiry(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.presign_refresh_margin = minio.presign_expires
+    client = mocker.AsyncMock()
+    client.generate_presigned_url.side_effect = ['first', 'second']
+    minio._presign_client = client
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    assert (await minio.get_presigned_url('file_name')).url == 'first'
+    assert (await minio.get_presigned_url('file_name')).url == 'second'
+
+@pytest.mark.anyio
+async def test_get_variant_creates_missing(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    original = io.BytesIO()
+    Image.new('RGB', (640, 480)).save(original, format='PNG')
+    mocker.patch.object(minio, 'get_file_shared', side_effect=HTTPException(status_code=404))
+    mocker.patch.object(minio, 'get_file', return_value=original.getvalue())
+    upload_file = mocker.patch.object(minio, 'upload_file')
+
+    result = await minio.get_variant('file_name', 320, 'webp')
+
+    upload_file.assert_called_once_with('variants/file_name/w320.webp', result['Content'])
+    with Image.open(io.BytesIO(result['Content'])) as image:
+        assert image.size == (320, 240)
+
+@pytest.mark.anyio
+async def test_get_variant_concurrent_requests_share_creation(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    original = io.BytesIO()
+    Image.new('RGB', (640, 480)).save(original, format='PNG')
+    creating = anyio.Event()
+    release = anyio.Event()
+
+    async def get_file(file_name):
+        creating.set()
+        await release.wait()
+        return original.getvalue()
+
+    mocker.patch.object(minio, 'get_file_stream', side_effect=HTTPException(status_code=404))
+    get_file_mock = mocker.patch.object(minio, 'get_file', side_effect=get_file)
+    mocker.patch.object(minio, 'upload_file')
+    results = []
+
+    async def request():
+        results.append(await minio.get_variant('file_name', 320, 'webp'))
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(request)
+        await creating.wait()
+        task_group.start_soon(request)
+        await anyio.wait_all_tasks_blocked()
+        release.set()
+
+    get_file_mock.assert_called_once()
+    assert len(results) == 2
+    assert results[0]['Content'] == results[1]['Content']
+
+@pytest.mark.anyio
+async def test_get_variant_not_an_image(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    mocker.patch.object(minio, 'get_file_shared', side_effect=HTTPException(status_code=404))
+    mocker.patch.object(minio, 'get_file', return_value=b'not an image')
+    upload_file = mocker.patch.object(minio, 'upload_file')
+
+    with pytest.raises(HTTPException) as exc:
+        await minio.get_variant('file_name', 320, 'webp')
+
+    assert exc.value.status_code == 415
+    upload_file.assert_not_called()
+
+@pytest.mark.anyio
+async def test_remove_variants(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    client = mocker.AsyncMock()
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    await minio.remove_variants('file_name')
+
+    keys = client.delete_objects.call_args.kwargs['Delete']['Objects']
+    assert {'Key': 'variants/file_name/w320.webp'} in keys
+    assert len(keys) == (len(minio.variant_widths) + 1) * len(minio.variant_formats)
+
+@pytest.mark.anyio
+async def test_upload_content_skips_existing(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    client = mocker.AsyncMock()
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+    upload_fileobj = mocker.patch.object(minio, 'upload_fileobj')
+
+    result = await minio.upload_content(UploadFile(io.BytesIO(b'image'), size=5))
+
+    assert result.image_name == hash_file(io.BytesIO(b'image'), 2)
+    upload_fileobj.assert_not_called()
+
+@pytest.mark.anyio
+async def test_upload_content_uploads_missing(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    client = mocker.AsyncMock()
+    client.head_object.side_effect = ClientError({'ResponseMetadata': {'HTTPStatusCode': 404}}, '')
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+    upload_file = mocker.patch.object(minio, 'upload_file')
+    mocker.patch.object(minio, 'remove_variants')
+
+    await minio.upload_content(UploadFile(io.BytesIO(b'image'), size=5))
+
+    upload_file.assert_called_once_with(hash_file(io.BytesIO(b'image'), 2), b'image')
+
+@pytest.mark.anyio
+async def test_remove_files_chunks_keys(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.delete_batch_size = 10
+    client = mocker.AsyncMock()
+    client.delete_objects.side_effect = [
+        {},
+        {'Errors': [{'Key': 'variants/second/w160.webp', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]},
+        {}, {}
+    ]
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    result = await minio.remove_files(['first', 'second'])
+
+    keys = [obj['Key'] for call in client.delete_objects.call_args_list for obj in call.kwargs['Delete']['Objects']]
+    assert result == {'first': None, 'second': 'Access Denied'}
+    assert len(keys) == 2 * (1 + len(minio.variant_keys('first')))
+    assert {'first', 'second', 'variants/first/w320.webp'} <= set(keys)
+    assert all(len(call.kwargs['Delete']['Objects']) <= 10 for call in client.delete_objects.call_args_list)
+
+@pytest.mark.anyio
+async def test_remove_files_chunk_failure(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.delete_batch_size = 1 + len(minio.variant_keys('first'))
+    client = mocker.AsyncMock()
+
+    async def delete_objects(Bucket, Delete):
+        if Delete['Objects'][0]['Key'] == 'second':
+            raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Slow Down'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, 'DeleteObjects')
+        return {}
+
+    client.delete_objects.side_effect = delete_objects
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    result = await minio.remove_files(['first', 'second', 'third'])
+
+    assert result == {'first': None, 'second': 'Slow Down', 'third': None}
+    assert client.delete_objects.call_count == 3
+
+@pytest.mark.anyio
+async def test_remove_files_concurrent_chunks(mocker: MockerFixture):
+    minio = MinIOService(settings=settings, access_key_id='key', secret_access_key='key')
+    minio.delete_batch_size = 1 + len(minio.variant_keys('first'))
+    minio.delete_concurrency = 2
+    client = mocker.AsyncMock()
+    active = peak = 0
+
+    async def delete_objects(Bucket, Delete):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await anyio.sleep(0.01)
+        active -= 1
+        return {}
+
+    client.delete_objects.side_effect = delete_objects
+    mocker.patch.object(MinIOService, 'open', return_value=client)
+
+    await minio.remove_files(['first', 'second', 'third', 'fourth'])
+
+    assert peak == 2
+    assert client.delete_objects.call_count == 4